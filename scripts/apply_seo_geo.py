@@ -1,9 +1,18 @@
 #!/usr/bin/env python3
+import argparse
 import json
 import re
+import sys
 from pathlib import Path
 
+from build_graph import BuildManifest, sha256_json, write_if_changed
+from instrumentation import Metrics, add_profile_argument
+from minify_html import MINIFY_VERSION, checked_minify
+from page_pool import add_jobs_argument, map_pages
+
 ROOT = Path(__file__).resolve().parents[1]
+# Bump when head_updates() or the patching rules change so every page is re-patched.
+SEO_PASS_VERSION = 2
 SITE_URL = "https://www.meettarek.com"
 BRAND_NAME = "Meettarek"
 PERSON_NAME = "Tarek Fahmy"
@@ -61,68 +70,175 @@ ENTITY_ALIASES = [
 ]
 
 
+HEAD_TAG_RE = re.compile(
+    r'<title>.*?</title>'
+    r'|<meta[^>]*>'
+    r'|<link[^>]*>\s*'
+    r'|<script id="seo-geo-jsonld" type="application/ld\+json">.*?</script>',
+    flags=re.IGNORECASE | re.DOTALL,
+)
+ATTR_VALUE_RE = {
+    attr: re.compile(rf'{attr}="([^"]*)"', flags=re.IGNORECASE) for attr in ("name", "property", "hreflang", "rel", "href")
+}
+CANONICAL_LINK_RE = re.compile(r'<link[^>]+rel="canonical"[^>]*>', flags=re.IGNORECASE | re.DOTALL)
+HREFLANG_LINK_RE = re.compile(
+    r'<link[^>]+rel="alternate"[^>]+hreflang="[^"]+"[^>]*>\s*',
+    flags=re.IGNORECASE | re.DOTALL,
+)
+JSONLD_MARKER = "<!-- Start of headEnd -->"
+
+
+class HeadPatch:
+    """Batch of <head> edits applied to one scan of the head and spliced back in one write.
+
+    The head is tokenized once and existing title/meta/link/JSON-LD tags are indexed by key.
+    Upserts replace the indexed tag or queue an insertion before </head>, in call order, so
+    the result matches running the equivalent single-tag helpers one after another.
+    """
+
+    def __init__(self, html: str):
+        self.html = html
+        self.head_end = html.find("</head>")
+        head = html if self.head_end == -1 else html[: self.head_end]
+        self.edits = {}
+        self.inserts = []
+        self.inserted = {}
+        self.title = None
+        self.meta = {"name": {}, "property": {}}
+        self.canonical = None
+        self.hreflang = []
+        self.hints = {}
+        self.jsonld = []
+        self.marker = head.find(JSONLD_MARKER)
+        for m in HEAD_TAG_RE.finditer(head):
+            tag = m.group(0)
+            lowered = tag[:6].lower()
+            span = (m.start(), m.end())
+            if lowered.startswith("<title"):
+                if self.title is None:
+                    self.title = span
+            elif lowered.startswith("<meta"):
+                for attr, index in self.meta.items():
+                    for key in ATTR_VALUE_RE[attr].findall(tag):
+                        index.setdefault(key.lower(), span)
+            elif lowered.startswith("<link"):
+                if HREFLANG_LINK_RE.match(tag):
+                    self.hreflang.append(span)
+                tag_end = m.start() + len(tag.rstrip())
+                if self.canonical is None and CANONICAL_LINK_RE.match(tag):
+                    self.canonical = (m.start(), tag_end)
+                rel, href = ATTR_VALUE_RE["rel"].search(tag), ATTR_VALUE_RE["href"].search(tag)
+                if rel and href:
+                    self.hints.setdefault((rel.group(1).lower(), href.group(1)), (m.start(), tag_end))
+            else:
+                self.jsonld.append(span)
+
+    def _replace(self, span, text: str):
+        self.edits[span[0]] = (span[1], text)
+
+    def _upsert(self, key, span, replacement: str):
+        if key in self.inserted:
+            self.inserts[self.inserted[key]] = f"    {replacement}\n"
+        elif span is not None:
+            self._replace(span, replacement)
+        elif self.head_end != -1:
+            self.inserted[key] = len(self.inserts)
+            self.inserts.append(f"    {replacement}\n")
+        return self
+
+    def set_title(self, title: str):
+        if self.title is not None:
+            self._replace(self.title, f"<title>{title}</title>")
+        return self
+
+    def meta_name(self, name: str, content: str):
+        span = self.meta["name"].get(name.lower())
+        return self._upsert(("name", name.lower()), span, f'<meta name="{name}" content="{content}">')
+
+    def meta_property(self, prop: str, content: str):
+        span = self.meta["property"].get(prop.lower())
+        return self._upsert(("property", prop.lower()), span, f'<meta property="{prop}" content="{content}">')
+
+    def link_canonical(self, href: str):
+        return self._upsert(("link", "canonical"), self.canonical, f'<link rel="canonical" href="{href}">')
+
+    def hreflang_links(self, href: str):
+        for span in self.hreflang:
+            self._replace(span, "")
+            # The old regex pass also swallowed the indent of tags already inserted at </head>.
+            if span[1] == self.head_end and self.inserts:
+                self.inserts[0] = self.inserts[0].lstrip()
+        self.hreflang = []
+        block = "\n".join(
+            f'    <link rel="alternate" href="{href}" hreflang="{code}">' for code in HREFLANG_CODES
+        )
+        if ("link", "hreflang") in self.inserted:
+            self.inserts[self.inserted[("link", "hreflang")]] = f"{block}\n"
+        elif self.head_end != -1:
+            self.inserted[("link", "hreflang")] = len(self.inserts)
+            self.inserts.append(f"{block}\n")
+        return self
+
+    def resource_hint(self, rel: str, href: str, attrs: str = ""):
+        """Upsert <link rel href> with extra attributes, e.g. ' as="font" crossorigin'."""
+        key = (rel.lower(), href)
+        return self._upsert(("hint",) + key, self.hints.get(key), f'<link rel="{rel}" href="{href}"{attrs}>')
+
+    def jsonld_block(self, payload: list[dict]):
+        jsonld_block = (
+            '<script id="seo-geo-jsonld" type="application/ld+json">'
+            + json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+            + "</script>"
+        )
+        for span in self.jsonld:
+            self._replace(span, "")
+        self.jsonld = []
+        if self.marker != -1:
+            end, text = self.edits.get(self.marker, (self.marker, ""))
+            self.edits[self.marker] = (end, f"{jsonld_block}\n{text}")
+        else:
+            self._upsert(("script", "jsonld"), None, jsonld_block)
+        return self
+
+    def render(self) -> str:
+        if not self.edits and not self.inserts:
+            return self.html
+        head_end = len(self.html) if self.head_end == -1 else self.head_end
+        parts = []
+        cursor = 0
+        for start in sorted(self.edits):
+            end, text = self.edits[start]
+            parts.append(self.html[cursor:start])
+            parts.append(text)
+            cursor = max(cursor, end)
+        parts.append(self.html[cursor:head_end])
+        parts.extend(self.inserts)
+        parts.append(self.html[head_end:])
+        return "".join(parts)
+
+
 def set_title(html: str, title: str) -> str:
-    return re.sub(r"<title>.*?</title>", f"<title>{title}</title>", html, count=1, flags=re.IGNORECASE | re.DOTALL)
+    return HeadPatch(html).set_title(title).render()
 
 
 def upsert_meta_name(html: str, name: str, content: str) -> str:
-    pattern = re.compile(
-        rf'<meta[^>]+name="{re.escape(name)}"[^>]*>',
-        flags=re.IGNORECASE | re.DOTALL,
-    )
-    replacement = f'<meta name="{name}" content="{content}">'
-    if pattern.search(html):
-        return pattern.sub(replacement, html, count=1)
-    return html.replace("</head>", f"    {replacement}\n</head>", 1)
+    return HeadPatch(html).meta_name(name, content).render()
 
 
 def upsert_meta_property(html: str, prop: str, content: str) -> str:
-    pattern = re.compile(
-        rf'<meta[^>]+property="{re.escape(prop)}"[^>]*>',
-        flags=re.IGNORECASE | re.DOTALL,
-    )
-    replacement = f'<meta property="{prop}" content="{content}">'
-    if pattern.search(html):
-        return pattern.sub(replacement, html, count=1)
-    return html.replace("</head>", f"    {replacement}\n</head>", 1)
+    return HeadPatch(html).meta_property(prop, content).render()
 
 
 def upsert_link_canonical(html: str, href: str) -> str:
-    pattern = re.compile(r'<link[^>]+rel="canonical"[^>]*>', flags=re.IGNORECASE | re.DOTALL)
-    replacement = f'<link rel="canonical" href="{href}">'
-    if pattern.search(html):
-        return pattern.sub(replacement, html, count=1)
-    return html.replace("</head>", f"    {replacement}\n</head>", 1)
+    return HeadPatch(html).link_canonical(href).render()
 
 
 def upsert_hreflang_links(html: str, href: str) -> str:
-    pattern = re.compile(
-        r'<link[^>]+rel="alternate"[^>]+hreflang="[^"]+"[^>]*>\s*',
-        flags=re.IGNORECASE | re.DOTALL,
-    )
-    html = pattern.sub("", html)
-    block = "\n".join(
-        f'    <link rel="alternate" href="{href}" hreflang="{code}">' for code in HREFLANG_CODES
-    )
-    return html.replace("</head>", f"{block}\n</head>", 1)
+    return HeadPatch(html).hreflang_links(href).render()
 
 
 def inject_jsonld(html: str, payload: list[dict]) -> str:
-    jsonld_block = (
-        '<script id="seo-geo-jsonld" type="application/ld+json">'
-        + json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
-        + "</script>"
-    )
-    html = re.sub(
-        r'<script id="seo-geo-jsonld" type="application/ld\+json">.*?</script>',
-        "",
-        html,
-        flags=re.IGNORECASE | re.DOTALL,
-    )
-    marker = "<!-- Start of headEnd -->"
-    if marker in html:
-        return html.replace(marker, f"{jsonld_block}\n{marker}", 1)
-    return html.replace("</head>", f"    {jsonld_block}\n</head>", 1)
+    return HeadPatch(html).jsonld_block(payload).render()
 
 
 def page_url_for(path: str) -> str:
@@ -227,7 +343,7 @@ def clean_none(payload: list[dict]) -> list[dict]:
     return [_clean(item) for item in payload]
 
 
-def apply_head_updates(html: str, title: str, description: str, path: str) -> str:
+def head_updates(patch: HeadPatch, title: str, description: str, path: str) -> HeadPatch:
     page_url = page_url_for(path)
     regional_terms = ["Nordics", "MENA"] + AREA_SERVED_COUNTRIES + REGIONAL_ALIASES
     keywords = ", ".join(
@@ -245,69 +361,130 @@ def apply_head_updates(html: str, title: str, description: str, path: str) -> st
             "data strategy consultant",
         ]
     )
-    html = set_title(html, title)
-    html = upsert_meta_name(html, "description", description)
-    html = upsert_meta_name(html, "keywords", keywords)
-    html = upsert_meta_name(html, "author", PERSON_NAME)
-    html = upsert_meta_name(html, "msvalidate.01", BING_VERIFICATION_CODE)
-    html = upsert_meta_name(html, "robots", "index,follow,max-image-preview:large,max-snippet:-1,max-video-preview:-1")
-    html = upsert_meta_name(html, "geo.region", "FI-UUS")
-    html = upsert_meta_name(
-        html,
+    patch.set_title(title)
+    patch.meta_name("description", description)
+    patch.meta_name("keywords", keywords)
+    patch.meta_name("author", PERSON_NAME)
+    patch.meta_name("msvalidate.01", BING_VERIFICATION_CODE)
+    patch.meta_name("robots", "index,follow,max-image-preview:large,max-snippet:-1,max-video-preview:-1")
+    patch.meta_name("geo.region", "FI-UUS")
+    patch.meta_name(
         "geo.placename",
         "Finland; Sweden; Norway; Denmark; United Arab Emirates; Saudi Arabia; Egypt; Qatar; Oman",
     )
-    html = upsert_link_canonical(html, page_url)
-    html = upsert_hreflang_links(html, page_url)
-    html = upsert_meta_property(html, "og:type", "website")
-    html = upsert_meta_property(html, "og:site_name", PERSON_NAME)
-    html = upsert_meta_property(html, "og:locale", "en_US")
-    html = upsert_meta_property(html, "og:title", title)
-    html = upsert_meta_property(html, "og:description", description)
-    html = upsert_meta_property(html, "og:url", page_url)
-    html = upsert_meta_property(html, "og:image", PERSON_IMAGE)
-    html = upsert_meta_name(html, "twitter:card", "summary_large_image")
-    html = upsert_meta_name(html, "twitter:site", "@messagetarek")
-    html = upsert_meta_name(html, "twitter:creator", "@messagetarek")
-    html = upsert_meta_name(html, "twitter:title", title)
-    html = upsert_meta_name(html, "twitter:description", description)
-    html = upsert_meta_name(html, "twitter:image", PERSON_IMAGE)
-    return html
+    patch.link_canonical(page_url)
+    patch.hreflang_links(page_url)
+    patch.meta_property("og:type", "website")
+    patch.meta_property("og:site_name", PERSON_NAME)
+    patch.meta_property("og:locale", "en_US")
+    patch.meta_property("og:title", title)
+    patch.meta_property("og:description", description)
+    patch.meta_property("og:url", page_url)
+    patch.meta_property("og:image", PERSON_IMAGE)
+    patch.meta_name("twitter:card", "summary_large_image")
+    patch.meta_name("twitter:site", "@messagetarek")
+    patch.meta_name("twitter:creator", "@messagetarek")
+    patch.meta_name("twitter:title", title)
+    patch.meta_name("twitter:description", description)
+    patch.meta_name("twitter:image", PERSON_IMAGE)
+    return patch
+
+
+def apply_head_updates(html: str, title: str, description: str, path: str) -> str:
+    return head_updates(HeadPatch(html), title, description, path).render()
+
+
+def patch_page(job) -> tuple[bool, int, dict, str]:
+    """Apply the head patch and link fixes to one page in place.
+
+    The result is written minified, exactly as minify_html.py would leave it, so the two
+    passes don't keep rewriting each other's output. When the minified page is not
+    DOM-equivalent it is written unminified instead. Returns (changed, email fixes,
+    minification {"bytes", "saved"}, None) or (changed, email fixes, None, problem).
+    """
+    page, path, title, desc, ld_payload = job
+    original = page.read_text(encoding="utf-8", errors="ignore")
+    patch = head_updates(HeadPatch(original), title, desc, path)
+    patch.jsonld_block(clean_none(ld_payload))
+    updated = patch.render()
+
+    bad_href_count = updated.count('href="https://hello@meettarek.com"')
+    updated = updated.replace('href="https://hello@meettarek.com"', 'href="mailto:hello@meettarek.com"')
+    minified, problem = checked_minify(updated)
+    if problem is None:
+        size = len(minified.encode("utf-8"))
+        minification = {"bytes": size, "saved": len(updated.encode("utf-8")) - size}
+    else:
+        minified, minification = updated, None
+
+    if minified != original:
+        write_if_changed(page, minified)
+        return True, bad_href_count, minification, problem
+    return False, bad_href_count, minification, problem
+
+
+def page_job(page: Path):
+    """The patch_page() job for a page this pass patches, or None."""
+    if page.relative_to(ROOT).as_posix() != "index.html":
+        return None
+    path = "/"
+    title = "Tarek Fahmy | Service Design, Product Strategy, AI Strategy and Transformation"
+    desc = (
+        "Tarek Fahmy is a Service Design consultant in Finland, Nordics, and MENA, helping "
+        "organizations deliver AI strategy and transformation across Nordics and MENA through "
+        "product and data innovation."
+    )
+    return page, path, title, desc, build_home_ld(page_url_for(path), desc)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Apply SEO/GEO head metadata and regenerate llms.txt/robots.txt.")
+    add_jobs_argument(parser)
+    add_profile_argument(parser)
+    return parser.parse_args(argv)
 
 
 def main() -> None:
+    args = parse_args()
+    metrics = Metrics("apply_seo_geo", args.profile)
     pages = [ROOT / "index.html"]
+    manifest = BuildManifest(ROOT)
     changed = 0
+    skipped = 0
     email_fixes = 0
+    jobs = []
+    job_nodes = []
 
     for page in pages:
         if not page.exists():
             continue
         rel = page.relative_to(ROOT).as_posix()
-        if rel != "index.html":
+        job = page_job(page)
+        if job is None:
             continue
+        _, _, title, desc, ld_payload = job
 
-        path = "/"
-        title = "Tarek Fahmy | Service Design, Product Strategy, AI Strategy and Transformation"
-        desc = (
-            "Tarek Fahmy is a Service Design consultant in Finland, Nordics, and MENA, helping "
-            "organizations deliver AI strategy and transformation across Nordics and MENA through "
-            "product and data innovation."
-        )
-        ld_payload = build_home_ld(page_url_for(path), desc)
-
-        original = page.read_text(encoding="utf-8", errors="ignore")
-        updated = original
-        updated = apply_head_updates(updated, title, desc, path)
-        updated = inject_jsonld(updated, clean_none(ld_payload))
+        # The pass patches pages in place: skip when the page is still exactly what the last
+        # run wrote with the same settings.
+        node_inputs = {"settings": sha256_json([SEO_PASS_VERSION, title, desc, ld_payload])}
+        if manifest.fresh_output(f"seo:{rel}", node_inputs, page):
+            skipped += 1
+            continue
 
-        bad_href_count = updated.count('href="https://hello@meettarek.com"')
-        email_fixes += bad_href_count
-        updated = updated.replace('href="https://hello@meettarek.com"', 'href="mailto:hello@meettarek.com"')
+        jobs.append(job)
+        job_nodes.append((f"seo:{rel}", node_inputs, page))
 
-        if updated != original:
-            page.write_text(updated, encoding="utf-8")
-            changed += 1
+    with metrics.stage("seo_pass"):
+        results = map_pages(patch_page, jobs, args.jobs)
+    for (node_key, node_inputs, page), (page_changed, fixes, minification, problem) in zip(job_nodes, results):
+        changed += page_changed
+        email_fixes += fixes
+        manifest.record(node_key, node_inputs, output=page)
+        rel = page.relative_to(ROOT).as_posix()
+        if problem is not None:
+            print(f"WARN {rel} not minified, DOM differs: {problem}", file=sys.stderr)
+            continue
+        manifest.record(f"minify:{rel}", {"version": MINIFY_VERSION}, minification, output=page)
 
     llms = (
         "# Tarek Fahmy\n\n"
@@ -360,7 +537,7 @@ def main() -> None:
         f"- Email: {EMAIL}\n"
         f"- LinkedIn: {LINKEDIN_URL}\n"
     )
-    (ROOT / "llms.txt").write_text(llms, encoding="utf-8")
+    write_if_changed(ROOT / "llms.txt", llms)
 
     robots = (
         "User-agent: *\n"
@@ -368,11 +545,15 @@ def main() -> None:
         "Host: www.meettarek.com\n"
         "Sitemap: https://www.meettarek.com/sitemap.xml\n"
     )
-    (ROOT / "robots.txt").write_text(robots, encoding="utf-8")
+    write_if_changed(ROOT / "robots.txt", robots)
+
+    manifest.save(prune_prefixes=("seo:",))
 
     print(f"Pages updated: {changed}")
+    print(f"Pages unchanged since last pass: {skipped}")
     print(f"Broken email links fixed: {email_fixes}")
     print("Generated: llms.txt")
+    metrics.publish(ROOT)
 
 
 if __name__ == "__main__":
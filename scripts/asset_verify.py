@@ -0,0 +1,110 @@
+import hashlib
+import json
+import mmap
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from build_graph import write_if_changed
+
+VERIFY_STATE_PATH = Path(".cache") / "verify_state.json"
+ASSET_ROOT = Path("assets") / "external"
+# compress_static.py writes these next to text assets; they are derived, not orphans.
+SIDECAR_SUFFIXES = (".gz", ".br")
+
+
+def hash_file(path: Path) -> str:
+    """sha256 of a file read through mmap; hashlib drops the GIL, so threads hash in parallel."""
+    with path.open("rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return hashlib.sha256(b"").hexdigest()
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return hashlib.sha256(mapped).hexdigest()
+
+
+def load_state(root: Path) -> dict:
+    try:
+        return json.loads((root / VERIFY_STATE_PATH).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def verify_assets(root: Path, workers: int) -> dict:
+    """Check every downloaded asset in content/assets.json against its recorded sha256 and size.
+
+    A file whose (size, mtime) matches the previous run is not read again. Entries without
+    a recorded sha256 (manifests from before the blob store) get one filled in from disk.
+    Files under assets/external that no entry refers to are reported as orphans.
+    """
+    started = time.perf_counter()
+    assets_path = root / "content" / "assets.json"
+    assets = json.loads(assets_path.read_text(encoding="utf-8"))
+    entries = assets.get("downloaded", [])
+    state = load_state(root)
+    new_state = {}
+    missing = []
+    todo = []
+    for entry in entries:
+        try:
+            st = (root / entry["path"]).stat()
+        except OSError:
+            missing.append(entry["path"])
+            continue
+        known = state.get(entry["path"])
+        if known and known[:2] == [st.st_size, st.st_mtime_ns]:
+            new_state[entry["path"]] = known
+        else:
+            todo.append((entry["path"], st.st_size, st.st_mtime_ns))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        digests = pool.map(lambda job: hash_file(root / job[0]), todo)
+        for (rel, size, mtime_ns), digest in zip(todo, digests):
+            new_state[rel] = [size, mtime_ns, digest]
+
+    mismatches = []
+    recorded = 0
+    for entry in entries:
+        found = new_state.get(entry["path"])
+        if found is None:
+            continue
+        size, _, digest = found
+        if not entry.get("sha256"):
+            entry["sha256"] = digest
+            entry["bytes"] = size
+            recorded += 1
+        elif entry["sha256"] != digest or entry.get("bytes", size) != size:
+            mismatches.append({
+                "path": entry["path"],
+                "expected_sha256": entry["sha256"],
+                "actual_sha256": digest,
+                "expected_bytes": entry.get("bytes"),
+                "actual_bytes": size,
+            })
+    if recorded:
+        write_if_changed(assets_path, json.dumps(assets, indent=2, ensure_ascii=True))
+
+    referenced = {entry["path"] for entry in entries}
+    orphans = []
+    for dirpath, _, filenames in os.walk(root / ASSET_ROOT):
+        for name in filenames:
+            rel = (Path(dirpath) / name).relative_to(root).as_posix()
+            if rel in referenced:
+                continue
+            if rel.endswith(SIDECAR_SUFFIXES) and rel[:-3] in referenced:
+                continue
+            orphans.append(rel)
+
+    (root / VERIFY_STATE_PATH).parent.mkdir(parents=True, exist_ok=True)
+    write_if_changed(root / VERIFY_STATE_PATH, json.dumps(new_state, indent=1, sort_keys=True))
+    return {
+        "checked": len(entries) - len(missing),
+        "hashed": len(todo),
+        "unchanged_skipped": len(entries) - len(missing) - len(todo),
+        "bytes_hashed": sum(size for _, size, _ in todo),
+        "sha256_recorded": recorded,
+        "seconds": round(time.perf_counter() - started, 4),
+        "mismatches": mismatches,
+        "missing": sorted(missing),
+        "orphans": sorted(orphans),
+    }
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from page_pool import DEFAULT_JOBS
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS_DIR = ROOT / ".cache" / "benchmarks"
+# Not outputs: caches, stage logs, the scripts themselves, and the report (its timings change every run).
+NOOP_SKIP_DIRS = {".cache", ".bench-logs", "scripts", "reports"}
+# Each stage runs as its own process in the scratch tree, in pipeline order:
+# (name, argv, takes --jobs).
+STAGES = [
+    ("sync", ["sync_site.py", "--no-post-processing"], True),
+    ("images", ["build_images.py"], True),
+    ("loading", ["image_loading.py"], True),
+    ("hints", ["resource_hints.py"], True),
+    ("seo", ["apply_seo_geo.py"], True),
+    ("search", ["search_index.py"], False),
+    ("offline", ["build_offline_html.py"], True),
+    ("minify", ["minify_html.py"], True),
+    ("compress", ["compress_static.py"], True),
+]
+IMAGES_PER_PAGE = 8
+MODULE_SHARE = 0.3
+
+
+class SyntheticSite:
+    """A Framer-shaped site generated deterministically from a seed.
+
+    Assets and the search index are linked through `asset_base`, a different host name for
+    the same server, so the sync treats them as external assets.
+    Only some project pages are linked from /projects; the rest are reachable only
+    through the search index, as on the real site.
+    """
+
+    def __init__(self, asset_base: str, projects: int, assets: int, page_kb: int, asset_kb: int, seed: int):
+        rng = random.Random(seed)
+        self.routes = {}
+        asset_urls = []
+        for i in range(assets):
+            if rng.random() < MODULE_SHARE:
+                path = f"/sites/bench/chunk-{i:05d}.mjs"
+                body = (f"export const c{i}=" + json.dumps("x" * 64) + ";\n") * max(1, asset_kb * 16)
+                self.routes[path] = ("text/javascript", body.encode("utf-8"))
+            else:
+                path = f"/images/img-{i:05d}.jpg"
+                self.routes[path] = ("image/jpeg", rng.randbytes(asset_kb * 1024))
+            asset_urls.append(asset_base + path)
+
+        slugs = [f"p-{i:04d}" for i in range(projects)]
+        index = {f"/projects/{s}": {"url": f"/projects/{s}", "title": f"Project {s}"} for s in slugs}
+        self.routes["/search/searchIndex.json"] = ("application/json", json.dumps(index).encode("utf-8"))
+        search_meta = f'<meta name="framer-search-index" content="{asset_base}/search/searchIndex.json">'
+
+        def page(title: str, links, body_paragraphs):
+            picks = rng.sample(asset_urls, min(IMAGES_PER_PAGE, len(asset_urls)))
+            parts = [
+                f"<!doctype html><html><head><title>{title}</title>",
+                f'<meta name="description" content="{title} description">',
+                search_meta,
+                "</head><body>",
+                f"<h1>{title}</h1>",
+            ]
+            parts += [f'<a href="{href}">{href}</a>' for href in links]
+            for url in picks:
+                if url.endswith(".mjs"):
+                    parts.append(f'<script type="module" src="{url}"></script>')
+                else:
+                    parts.append(f'<img src="{url}" alt="{title}">')
+            parts += [f"<p>{p}</p>" for p in body_paragraphs]
+            parts.append("</body></html>")
+            return ("text/html; charset=utf-8", "\n".join(parts).encode("utf-8"))
+
+        def filler(kb: int):
+            words = ["service", "design", "strategy", "research", "product", "data", "nordics", "mena"]
+            return [" ".join(rng.choice(words) for _ in range(20)) for _ in range(max(1, kb * 1024 // 160))]
+
+        self.routes["/"] = page("Bench Home", ["./projects"], filler(page_kb))
+        self.routes["/projects"] = page("Projects", [f"./projects/{s}" for s in slugs[::2]], filler(page_kb // 4))
+        for s in slugs:
+            body = ["2024", "Services", "Research • Design", "Client", "Bench Client", "Overview"] + filler(page_kb)
+            self.routes[f"/projects/{s}"] = page(f"Project {s}", ["../projects"], body)
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency_ms: float, jitter_ms: float, error_rate: float, seed: int):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.site = None
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            delay = max(0.0, server.latency + server.rng.uniform(-server.jitter, server.jitter))
+            fail = server.rng.random() < server.error_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            with server.lock:
+                server.errors += 1
+            self.reply(503, "text/plain", b"injected error\n")
+            return
+        route = server.site.routes.get(self.path.split("?", 1)[0].split("#", 1)[0])
+        if route is None:
+            self.reply(404, "text/plain", b"not found\n")
+            return
+        ctype, body = route
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.reply(304, ctype, b"", {"ETag": etag})
+            return
+        self.reply(200, ctype, body, {"ETag": etag})
+
+    def reply(self, status: int, ctype: str, body: bytes, extra=None):
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        for k, v in (extra or {}).items():
+            self.send_header(k, v)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+            with self.server.lock:
+                self.server.bytes_sent += len(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run_stage(workdir: Path, argv, env: dict) -> dict:
+    """Run one pipeline script to completion; wall/CPU time and peak RSS come from wait4()."""
+    log = (workdir / ".bench-logs").joinpath(argv[0] + ".log")
+    log.parent.mkdir(exist_ok=True)
+    with log.open("ab") as out:
+        started = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, str(workdir / "scripts" / argv[0]), *argv[1:]],
+            cwd=workdir,
+            env=env,
+            stdout=out,
+            stderr=subprocess.STDOUT,
+        )
+        # wait4() rusage covers the script and its reaped worker processes.
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - started
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        "exit_code": proc.returncode,
+        "wall_seconds": round(wall, 4),
+        "cpu_seconds": round(usage.ru_utime + usage.ru_stime, 4),
+        # ru_maxrss is in bytes on macOS and in kilobytes on Linux.
+        "peak_rss_kb": usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss,
+    }
+
+
+def tree_state(workdir: Path) -> dict:
+    """mtime_ns per output file, leaving out the caches, logs and the timing report."""
+    state = {}
+    for dirpath, dirnames, filenames in os.walk(workdir):
+        if dirpath == str(workdir):
+            dirnames[:] = [d for d in dirnames if d not in NOOP_SKIP_DIRS]
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            state[path] = os.stat(path).st_mtime_ns
+    return state
+
+
+def page_count(workdir: Path) -> int:
+    pages = workdir / "content" / "pages.json"
+    return len(json.loads(pages.read_text(encoding="utf-8"))) if pages.exists() else 0
+
+
+def run_pass(workdir: Path, server: StandInServer, env: dict, jobs: int) -> dict:
+    stages = []
+    state = tree_state(workdir)
+    for name, argv, pooled in STAGES:
+        before = (server.requests, server.bytes_sent)
+        row = {"stage": name, **run_stage(workdir, argv + (["--jobs", str(jobs)] if pooled else []), env)}
+        after = tree_state(workdir)
+        row["files_written"] = sorted(
+            str(Path(path).relative_to(workdir)) for path in state.keys() | after.keys() if state.get(path) != after.get(path)
+        )
+        state = after
+        pages = page_count(workdir)
+        row["pages_per_second"] = round(pages / row["wall_seconds"], 2) if row["wall_seconds"] else None
+        if name == "sync":
+            row["requests"] = server.requests - before[0]
+            row["bytes_received"] = server.bytes_sent - before[1]
+            row["mb_per_second"] = round(row["bytes_received"] / 1e6 / row["wall_seconds"], 3)
+        if row["exit_code"]:
+            print(f"WARN stage {name} exited with {row['exit_code']}; see {workdir / '.bench-logs'}", file=sys.stderr)
+        stages.append(row)
+    return {
+        "pages": page_count(workdir),
+        "total_wall_seconds": round(sum(s["wall_seconds"] for s in stages), 4),
+        "files_written": sum(len(s["files_written"]) for s in stages),
+        "stages": stages,
+    }
+
+
+def print_comparison(result: dict, baseline_path: Path):
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    for current, previous in zip(result["passes"], baseline["passes"]):
+        old = {s["stage"]: s for s in previous["stages"]}
+        for stage in current["stages"]:
+            before = old.get(stage["stage"])
+            if not before or not before["wall_seconds"]:
+                continue
+            change = (stage["wall_seconds"] - before["wall_seconds"]) / before["wall_seconds"] * 100
+            print(
+                f"  pass {current['pass']} {stage['stage']:<9} {before['wall_seconds']:8.3f}s -> "
+                f"{stage['wall_seconds']:8.3f}s ({change:+.1f}%)"
+            )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline against a local synthetic Framer site.")
+    parser.add_argument("--projects", type=int, default=50, help="project pages")
+    parser.add_argument("--assets", type=int, default=200, help="distinct assets")
+    parser.add_argument("--page-kb", type=int, default=64, help="approximate text per page")
+    parser.add_argument("--asset-kb", type=int, default=32, help="size of each asset")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="uniform +/- jitter on the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered 503")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--passes", type=int, default=2, help="pass 1 is cold; later passes reuse caches")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS)
+    parser.add_argument("--out", type=Path, help="results file (default: .cache/benchmarks/bench-<epoch>.json)")
+    parser.add_argument("--baseline", type=Path, help="earlier results file to print per-stage changes against")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch tree for inspection")
+    parser.add_argument(
+        "--check-noop",
+        action="store_true",
+        help="exit 1 if a pass after the second writes, touches or removes an output file (needs --passes 3)",
+    )
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    server = StandInServer(args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    port = server.server_address[1]
+    page_base = f"http://127.0.0.1:{port}"
+    asset_host = f"localhost:{port}"
+    server.site = SyntheticSite(
+        f"http://{asset_host}", args.projects, args.assets, args.page_kb, args.asset_kb, args.seed
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    workdir = Path(tempfile.mkdtemp(prefix="work-", dir=RESULTS_DIR))
+    shutil.copytree(ROOT / "scripts", workdir / "scripts", ignore=shutil.ignore_patterns("__pycache__"))
+    if (ROOT / "vercel.json").exists():
+        shutil.copy2(ROOT / "vercel.json", workdir / "vercel.json")
+    env = dict(
+        os.environ,
+        SYNC_BASE_URL=page_base,
+        SYNC_SEED_PATHS="/",
+        SYNC_EXTRA_ASSET_HOSTS=asset_host,
+        PYTHONDONTWRITEBYTECODE="1",
+    )
+
+    result = {
+        "generated_at_epoch": int(time.time()),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline", "keep")},
+        "passes": [],
+    }
+    try:
+        for number in range(1, args.passes + 1):
+            run = run_pass(workdir, server, env, args.jobs)
+            result["passes"].append({"pass": number, **run})
+            print(f"Pass {number}: {run['pages']} pages in {run['total_wall_seconds']:.3f}s, {run['files_written']} files written")
+            for stage in run["stages"]:
+                print(
+                    f"  {stage['stage']:<9} wall {stage['wall_seconds']:8.3f}s  cpu {stage['cpu_seconds']:8.3f}s  "
+                    f"rss {stage['peak_rss_kb'] / 1024:7.1f} MB  files {len(stage['files_written']):5d}"
+                )
+    finally:
+        server.shutdown()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    result["server"] = {"requests": server.requests, "injected_errors": server.errors, "bytes_sent": server.bytes_sent}
+
+    out = args.out or RESULTS_DIR / f"bench-{result['generated_at_epoch']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    print(f"Results: {out}")
+    if args.keep:
+        print(f"Scratch tree: {workdir}")
+    if args.baseline:
+        print(f"Compared with {args.baseline}:")
+        print_comparison(result, args.baseline)
+    if args.check_noop:
+        # The stand-in site does not change between passes. The first warm pass still records
+        # that assets came from cache ("cached": true); after that there is nothing to write.
+        if args.passes < 3:
+            print("WARN --check-noop needs --passes 3 or more", file=sys.stderr)
+        touched = [(run["pass"], stage["stage"], path) for run in result["passes"][2:] for stage in run["stages"] for path in stage["files_written"]]
+        for number, stage, path in touched:
+            print(f"WARN pass {number} {stage} wrote {path}", file=sys.stderr)
+        if touched:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
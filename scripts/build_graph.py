@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+MANIFEST_PATH = Path(".cache") / "build_manifest.json"
+REPORT_PATH = Path("reports") / "integrity_report.json"
+# mkstemp() creates files as 0600; published files get the usual umask-derived mode instead.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+FILE_MODE = 0o666 & ~_UMASK
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_text(text: str) -> str:
+    return sha256_bytes(text.encode("utf-8"))
+
+
+def sha256_json(value) -> str:
+    return sha256_text(json.dumps(value, sort_keys=True, ensure_ascii=True, separators=(",", ":")))
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def write_if_changed(path: Path, data) -> bool:
+    """Atomically write `data` unless `path` already holds exactly these bytes.
+
+    Leaving identical files untouched keeps their mtimes stable for deploy caches.
+    """
+    payload = data.encode("utf-8") if isinstance(data, str) else data
+    try:
+        if path.stat().st_size == len(payload) and path.read_bytes() == payload:
+            return False
+    except FileNotFoundError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".part")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(payload)
+    os.chmod(tmp, FILE_MODE)
+    os.replace(tmp, path)
+    return True
+
+
+def site_pages(base: Path):
+    """The site's HTML pages under `base` (the repo root or offline/), whether or not they exist yet.
+
+    Every per-page pass enumerates pages here, so a new page reaches all of them.
+    """
+    return [base / "index.html"] + sorted((base / "projects").glob("*/index.html")) + [base / "projects" / "index.html"]
+
+
+def update_report(root: Path, keys, value):
+    """Set `report[k1][k2]... = value` in the integrity report, if the sync has written one.
+
+    Later stages use this to add their blocks to the report the sync produced.
+    """
+    path = root / REPORT_PATH
+    if not path.exists():
+        return
+    keys = (keys,) if isinstance(keys, str) else tuple(keys)
+    report = json.loads(path.read_text(encoding="utf-8"))
+    node = report
+    for key in keys[:-1]:
+        node = node.setdefault(key, {})
+    node[keys[-1]] = value
+    write_if_changed(path, json.dumps(report, indent=2, ensure_ascii=True))
+
+
+class BuildManifest:
+    """Records, per derived output, the content hashes of the inputs it was built from.
+
+    A node is `{"inputs": {...}, "value": ..., "output": sha256}`; it is fresh when the
+    current input hashes match and (for file outputs) the file on disk still has the
+    recorded hash. Nodes not touched during a run can be pruned by key prefix on save.
+    """
+
+    def __init__(self, root: Path, path: Path = MANIFEST_PATH):
+        self.root = root
+        self.path = root / path
+        self.nodes = {}
+        self.touched = set()
+        if self.path.exists():
+            try:
+                self.nodes = json.loads(self.path.read_text(encoding="utf-8")).get("nodes", {})
+            except (OSError, ValueError):
+                self.nodes = {}
+
+    def lookup(self, key: str, inputs: dict):
+        """Return the stored value for `key` if it was built from `inputs`, else None."""
+        node = self.nodes.get(key)
+        if node is None or node.get("inputs") != inputs:
+            return None
+        self.touched.add(key)
+        return node.get("value")
+
+    def fresh_output(self, key: str, inputs: dict, out: Path) -> bool:
+        node = self.nodes.get(key)
+        if node is None or node.get("inputs") != inputs or not out.exists():
+            return False
+        if sha256_file(out) != node.get("output"):
+            return False
+        self.touched.add(key)
+        return True
+
+    def record(self, key: str, inputs: dict, value=None, output: Path = None):
+        node = {"inputs": inputs}
+        if value is not None:
+            node["value"] = value
+        if output is not None:
+            node["output"] = sha256_file(output)
+            node["path"] = output.relative_to(self.root).as_posix()
+        self.nodes[key] = node
+        self.touched.add(key)
+
+    def stale_keys(self, prefix: str):
+        """Keys under `prefix` that were neither reused nor recorded during this run."""
+        return [key for key in self.nodes if key.startswith(prefix) and key not in self.touched]
+
+    def stale_outputs(self, prefix: str):
+        """Output paths recorded under `prefix` that were not produced during this run."""
+        return [self.root / self.nodes[key]["path"] for key in self.stale_keys(prefix) if "path" in self.nodes[key]]
+
+    def save(self, prune_prefixes=()):
+        for key in list(self.nodes):
+            if key not in self.touched and key.startswith(tuple(prune_prefixes)):
+                del self.nodes[key]
+        # Node keys are sorted for stable diffs, but stored values keep their key order:
+        # reused page records must serialize exactly as freshly parsed ones do.
+        nodes = {key: self.nodes[key] for key in sorted(self.nodes)}
+        write_if_changed(self.path, json.dumps({"nodes": nodes}, indent=1, ensure_ascii=True))
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+import argparse
+import io
+import json
+import sys
+from pathlib import Path
+
+from build_graph import BuildManifest, sha256_file, update_report, write_if_changed
+from instrumentation import Metrics, add_profile_argument
+from page_pool import add_jobs_argument, map_pages
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it the mirror keeps serving originals.
+    Image = None
+
+ROOT = Path(__file__).resolve().parents[1]
+IMAGES_MANIFEST = ROOT / "content" / "images.json"
+DERIVED_DIR = Path("assets") / "derived" / "images"
+SOURCE_PREFIX = "assets/external/framerusercontent.com/images/"
+SOURCE_SUFFIXES = {".jpg", ".jpeg", ".png"}
+WIDTH_BUCKETS = (320, 640, 960, 1280, 1920)
+QUALITY = {"webp": 80, "avif": 60}
+# Bump when encoder settings or bucket rules change so every derivative is regenerated.
+IMAGE_PIPELINE_VERSION = 2
+
+
+def available_formats():
+    if Image is None:
+        return []
+    try:
+        import pillow_avif  # noqa: F401  (registers AVIF on Pillow < 11.2)
+    except ImportError:
+        pass
+    Image.init()
+    return [fmt for fmt in ("avif", "webp") if fmt.upper() in Image.SAVE]
+
+
+def bucket_widths(width: int):
+    """Every bucket narrower than the source, plus the source width itself up to the largest bucket."""
+    widths = [w for w in WIDTH_BUCKETS if w < width]
+    if width <= WIDTH_BUCKETS[-1]:
+        widths.append(width)
+    return widths
+
+
+def derive_image(job):
+    """Encode every width/format derivative of one source image; runs in a worker process."""
+    src, digest, formats = job
+    out_dir = ROOT / DERIVED_DIR / digest[:2]
+    try:
+        return _derive(ROOT / src, digest, formats, out_dir)
+    except (OSError, ValueError) as exc:
+        return {"error": str(exc)}
+
+
+def _derive(src: Path, digest: str, formats, out_dir: Path) -> dict:
+    with Image.open(src) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "PA") else "RGB")
+        width, height = img.size
+        variants = []
+        for w in bucket_widths(width):
+            h = max(1, round(height * w / width))
+            resized = img if w == width else img.resize((w, h), Image.LANCZOS)
+            for fmt in formats:
+                buf = io.BytesIO()
+                resized.save(buf, fmt.upper(), quality=QUALITY[fmt])
+                out = out_dir / f"{digest[:20]}-{w}.{fmt}"
+                write_if_changed(out, buf.getvalue())
+                variants.append({
+                    "format": fmt,
+                    "width": w,
+                    "height": h,
+                    "path": out.relative_to(ROOT).as_posix(),
+                    "bytes": len(buf.getvalue()),
+                })
+    return {"width": width, "height": height, "variants": variants}
+
+
+def served_bytes(entry: dict) -> int:
+    """Bytes of the largest WebP derivative: what a wide viewport downloads instead of the original."""
+    webp = [v["bytes"] for v in entry["variants"] if v["format"] == "webp"]
+    return max(webp) if webp else entry["bytes"]
+
+
+def savings_report(images: list) -> dict:
+    by_url = {item["url"]: item for item in images}
+    pages_path = ROOT / "content" / "pages.json"
+    pages = json.loads(pages_path.read_text(encoding="utf-8")) if pages_path.exists() else []
+    per_page = []
+    for page in pages:
+        original = derived = 0
+        for src in sorted({img["src"] for img in page.get("images", [])}):
+            entry = by_url.get(src)
+            if entry is None:
+                continue
+            original += entry["bytes"]
+            derived += served_bytes(entry)
+        if original:
+            per_page.append({
+                "path": page["path"],
+                "original_bytes": original,
+                "derived_bytes": derived,
+                "saved_bytes": original - derived,
+            })
+    return {
+        "sources": len({item["sha256"] for item in images}),
+        "derivatives": sum(len(item["variants"]) for item in images),
+        "original_bytes": sum(p["original_bytes"] for p in per_page),
+        "derived_bytes": sum(p["derived_bytes"] for p in per_page),
+        "saved_bytes": sum(p["saved_bytes"] for p in per_page),
+        "pages": per_page,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build WebP/AVIF width derivatives of mirrored images.")
+    add_jobs_argument(parser)
+    add_profile_argument(parser)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    metrics = Metrics("build_images", args.profile)
+    formats = available_formats()
+    if "webp" not in formats:
+        print("WARN Pillow with WebP support not installed; skipping image derivatives", file=sys.stderr)
+        return
+
+    assets = json.loads((ROOT / "content" / "assets.json").read_text(encoding="utf-8"))
+    sources = []
+    for item in assets.get("downloaded", []):
+        path = item["path"]
+        if path.startswith(SOURCE_PREFIX) and Path(path).suffix.lower() in SOURCE_SUFFIXES and (ROOT / path).exists():
+            sources.append((item["url"], path, item.get("sha256") or sha256_file(ROOT / path)))
+
+    manifest = BuildManifest(ROOT)
+    node_inputs = {"version": IMAGE_PIPELINE_VERSION, "widths": list(WIDTH_BUCKETS), "formats": formats}
+    derived = {}
+    todo = []
+    queued = set()
+    for _, path, digest in sources:
+        if digest in derived or digest in queued:
+            continue
+        value = manifest.lookup(f"image:{digest}", node_inputs)
+        if value is not None and all((ROOT / v["path"]).exists() for v in value["variants"]):
+            derived[digest] = value
+        else:
+            todo.append((path, digest, formats))
+            queued.add(digest)
+
+    failed = 0
+    with metrics.stage("image_encode"):
+        encoded = map_pages(derive_image, todo, args.jobs)
+    for (path, digest, _), value in zip(todo, encoded):
+        if "error" in value:
+            failed += 1
+            print(f"WARN image derivative failed: {path} ({value['error']})", file=sys.stderr)
+            continue
+        manifest.record(f"image:{digest}", node_inputs, value)
+        derived[digest] = value
+
+    images = []
+    for url, path, digest in sources:
+        value = derived.get(digest)
+        if value is None:
+            continue
+        size = (ROOT / path).stat().st_size
+        # A derivative that is not smaller than its source would only cost bytes.
+        if served_bytes({"variants": value["variants"], "bytes": size}) >= size:
+            continue
+        images.append({"url": url, "path": path, "sha256": digest, "bytes": size, **value})
+
+    write_if_changed(IMAGES_MANIFEST, json.dumps({"images": images}, indent=2, ensure_ascii=True))
+    if not failed:
+        manifest.save(prune_prefixes=("image:",))
+        keep = {ROOT / v["path"] for value in derived.values() for v in value["variants"]}
+        for f in (ROOT / DERIVED_DIR).rglob("*"):
+            if f.is_file() and f not in keep:
+                f.unlink()
+    else:
+        manifest.save()
+
+    update_report(ROOT, "image_derivatives", savings_report(images))
+
+    print(f"Image sources: {len(derived)} ({len(todo) - failed} encoded, {len(derived) - len(todo) + failed} reused)")
+    print(f"Image sources failed: {failed}")
+    print(f"Images with derivatives: {len(images)} ({', '.join(formats)})")
+    metrics.publish(ROOT)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,52 @@
 #!/usr/bin/env python3
+import argparse
 import html
 import json
-import shutil
+import os
+import re
+import sys
+import time
 from pathlib import Path
 from urllib.parse import urlparse
 
+from build_graph import BuildManifest, sha256_bytes, sha256_file, sha256_json, sha256_text, site_pages, update_report, write_if_changed
+from instrumentation import Metrics, add_profile_argument
+from minify_html import MINIFY_VERSION, checked_minify
+from page_pool import add_jobs_argument, map_pages
+from service_worker import add_registration, precache_manifest, write_service_worker
+
 ROOT = Path(__file__).resolve().parents[1]
 OFFLINE = ROOT / "offline"
+# Bump when the rewrite rules change so every offline page is regenerated.
+OFFLINE_BUILD_VERSION = 7
+# Downloaded text assets that can embed absolute asset URLs (sync_site.DEPENDENCY_SUFFIXES).
+# Their localized copies live under offline/ so the downloaded files stay verifiable.
+REWRITE_ASSET_SUFFIXES = {".mjs", ".js", ".css", ".json"}
+SHARED_DIR = OFFLINE / "shared"
+# Smaller blocks cost more as an extra request than they save by being cached.
+MIN_SHARED_BLOCK_BYTES = 1024
+INLINE_BLOCK_RE = re.compile(r"<(script|style)\b([^>]*)>(.*?)</\1\s*>", re.IGNORECASE | re.DOTALL)
+SCRIPT_TYPE_RE = re.compile(r'\stype="([^"]*)"', re.IGNORECASE)
+# Data blocks (JSON-LD, framer/appear, framer/handover) are read from the DOM and must stay inline.
+SCRIPT_JS_TYPES = {"", "text/javascript", "application/javascript", "module"}
+# These attributes are ignored on inline scripts but would take effect on an external one.
+SCRIPT_LOAD_ATTR_RE = re.compile(r"\s(?:src|async|defer)\b", re.IGNORECASE)
+# The Framer runtime finds these <style> blocks by selector (the SSR block lists the
+# components whose CSS is already on the page); hoisted, hydration injects it all again.
+STYLE_RUNTIME_ATTR_RE = re.compile(r"\sdata-framer-(?:css-ssr|breakpoint-css)\b", re.IGNORECASE)
+IMAGES_MANIFEST = ROOT / "content" / "images.json"
+IMG_TAG_RE = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+IMG_SRC_RE = re.compile(r'\ssrc="([^"]*)"', re.IGNORECASE)
+IMG_SRCSET_RE = re.compile(r'\ssrcset="[^"]*"', re.IGNORECASE)
+# An <img> srcset cannot offer a format fallback the way <picture><source type> can, so
+# only the derivative every current browser decodes is used.
+SRCSET_FORMAT = "webp"
+# Connection and fetch hints (resource_hints.py, Framer's own) that still name a remote
+# origin after the rewrite would open network connections the offline page never needs.
+REMOTE_HINT_RELS = {"preconnect", "dns-prefetch", "preload", "modulepreload", "prefetch"}
+LINK_TAG_RE = re.compile(r"<link\b[^>]*>", re.IGNORECASE)
+LINK_REL_RE = re.compile(r'\srel="([^"]*)"', re.IGNORECASE)
+LINK_HREF_RE = re.compile(r'\shref="([^"]*)"', re.IGNORECASE)
 
 
 def to_relative(from_file: Path, to_file: Path) -> str:
@@ -15,7 +55,285 @@ def to_relative(from_file: Path, to_file: Path) -> str:
     )
 
 
+class UrlRewriter:
+    """Rewrites every mapped asset URL (raw and HTML-escaped) in a single regex pass.
+
+    Alternatives are ordered as the manifest is, raw before escaped, so when one URL is a
+    prefix of another the earlier entry wins exactly as the old sequential replace() did.
+    """
+
+    def __init__(self, mappings: dict):
+        self.targets = {}
+        keys = []
+        for url, local in mappings.items():
+            if not local.exists():
+                continue
+            escaped_url = html.escape(url, quote=True)
+            for key in (url, escaped_url):
+                if key not in self.targets:
+                    self.targets[key] = local
+                    keys.append(key)
+        self.pattern = re.compile("|".join(re.escape(k) for k in keys)) if keys else None
+        self._relative = {}
+
+    def relative_paths(self, out_dir: Path) -> dict:
+        """Relative link for every target as seen from `out_dir`, computed once per directory."""
+        cached = self._relative.get(out_dir)
+        if cached is None:
+            cached = {}
+            for key, local in self.targets.items():
+                rel_local = os.path.relpath(local, out_dir).replace("\\", "/")
+                if not rel_local.startswith("."):
+                    rel_local = "./" + rel_local
+                cached[key] = rel_local
+            self._relative[out_dir] = cached
+        return cached
+
+    def rewrite(self, text: str, dst: Path) -> str:
+        if self.pattern is None:
+            return text
+        rel = self.relative_paths(dst.parent)
+        return self.pattern.sub(lambda m: rel[m.group(0)], text)
+
+    def rewrite_rooted(self, text: str) -> str:
+        """Rewrite to site-root paths (/assets/...), as serve_offline.py serves them.
+
+        URLs a script builds or fetches resolve against the page that loaded it, not the
+        script file, so a relative link would only be right for one page depth.
+        """
+        if self.pattern is None:
+            return text
+        rooted = self._relative.get(None)
+        if rooted is None:
+            rooted = {}
+            for key, local in self.targets.items():
+                base = OFFLINE if OFFLINE in local.parents else ROOT
+                rooted[key] = "/" + local.relative_to(base).as_posix()
+            self._relative[None] = rooted
+        return self.pattern.sub(lambda m: rooted[m.group(0)], text)
+
+
+def rewrite_sequential(text: str, dst: Path, mappings: dict) -> str:
+    """Reference implementation: one replace() pair per asset. Used by --compare."""
+    for url, local in mappings.items():
+        if not local.exists():
+            continue
+        rel_local = str(to_relative(dst, local)).replace("\\", "/")
+        if not rel_local.startswith("."):
+            rel_local = "./" + rel_local
+
+        escaped_url = html.escape(url, quote=True)
+        text = text.replace(url, rel_local)
+        text = text.replace(escaped_url, rel_local)
+    return text
+
+
+def load_image_derivatives() -> dict:
+    """Source URL -> images.json entry, for images whose derivative files are all present."""
+    if not IMAGES_MANIFEST.exists():
+        return {}
+    images = json.loads(IMAGES_MANIFEST.read_text(encoding="utf-8")).get("images", [])
+    return {
+        item["url"]: item
+        for item in images
+        if item["variants"] and all((ROOT / v["path"]).exists() for v in item["variants"])
+    }
+
+
+def add_derivative_srcsets(text: str, dst: Path, derivatives: dict) -> str:
+    """Point the srcset of <img> tags whose source has derivatives at the WebP derivatives.
+
+    Only the attribute changes: wrapping Framer's server-rendered <img> in a <picture>
+    would change the tree React hydrates. `src` stays the original (localized by the URL
+    rewrite) for browsers that ignore srcset.
+    """
+    if not derivatives:
+        return text
+
+    def swap(m):
+        tag = m.group(0)
+        src = IMG_SRC_RE.search(tag)
+        entry = derivatives.get(html.unescape(src.group(1))) if src else None
+        if entry is None:
+            return tag
+        candidates = [
+            f"{os.path.relpath(ROOT / v['path'], dst.parent)} {v['width']}w".replace("\\", "/")
+            for v in entry["variants"]
+            if v["format"] == SRCSET_FORMAT
+        ]
+        if not candidates:
+            return tag
+        srcset = f' srcset="{", ".join(candidates)}"'
+        if IMG_SRCSET_RE.search(tag):
+            return IMG_SRCSET_RE.sub(lambda _: srcset, tag, count=1)
+        return tag[:4] + srcset + tag[4:]
+
+    return IMG_TAG_RE.sub(swap, text)
+
+
+def drop_remote_hints(text: str, hosts: set) -> str:
+    """Remove resource hint <link>s whose href is on a host the offline build localizes."""
+
+    def drop(m):
+        tag = m.group(0)
+        rel, href = LINK_REL_RE.search(tag), LINK_HREF_RE.search(tag)
+        if rel and href and rel.group(1).lower() in REMOTE_HINT_RELS:
+            if urlparse(html.unescape(href.group(1))).netloc in hosts:
+                return ""
+        return tag
+
+    return LINK_TAG_RE.sub(drop, text)
+
+
+def hoistable(kind: str, attrs: str, body: str) -> bool:
+    if len(body.encode("utf-8")) < MIN_SHARED_BLOCK_BYTES:
+        return False
+    if kind.lower() == "style":
+        return not STYLE_RUNTIME_ATTR_RE.search(attrs)
+    script_type = SCRIPT_TYPE_RE.search(attrs)
+    return (script_type.group(1).lower() if script_type else "") in SCRIPT_JS_TYPES and not SCRIPT_LOAD_ATTR_RE.search(attrs)
+
+
+def plan_shared_blocks(sources, rewriter: UrlRewriter) -> dict:
+    """Inline <style>/<script> blocks found on two or more pages, as
+    {body sha256: (file name, content, page count)}.
+
+    Files are named by the hash of their content. CSS URLs are rewritten relative to the
+    shared file, which is what url() resolves against. Script URLs resolve against the
+    page, so scripts that reference a localized asset stay inline.
+    """
+    pages = {}
+    bodies = {}
+    for text in sources:
+        for kind, attrs, body in INLINE_BLOCK_RE.findall(text):
+            if not hoistable(kind, attrs, body):
+                continue
+            digest = sha256_text(body)
+            pages[digest] = pages.get(digest, 0) + 1
+            bodies[digest] = (kind.lower(), body)
+    plan = {}
+    for digest, (kind, body) in bodies.items():
+        if pages[digest] < 2:
+            continue
+        suffix = "css" if kind == "style" else "js"
+        content = rewriter.rewrite(body, SHARED_DIR / f"block.{suffix}")
+        if suffix == "js" and content != body:
+            continue
+        plan[digest] = (f"{sha256_text(content)[:16]}.{suffix}", content, pages[digest])
+    return plan
+
+
+def hoist_blocks(text: str, dst: Path, shared: dict) -> str:
+    """Replace inline blocks listed in `shared` ({body sha256: file}) with external references.
+
+    The tag keeps its attributes and position, so cascade and execution order are unchanged.
+    """
+    if not shared:
+        return text
+
+    def swap(m):
+        kind, attrs, body = m.groups()
+        name = shared.get(sha256_text(body))
+        if name is None or not hoistable(kind, attrs, body):
+            return m.group(0)
+        href = os.path.relpath(SHARED_DIR / name, dst.parent).replace("\\", "/")
+        if kind.lower() == "style":
+            return f'<link rel="stylesheet" href="{href}"{attrs}>'
+        return f'<script src="{href}"{attrs}></script>'
+
+    return INLINE_BLOCK_RE.sub(swap, text)
+
+
+def write_shared_blocks(plan: dict) -> dict:
+    """Write the planned shared files, remove the ones no longer planned; returns {body sha256: file}."""
+    for name, content, _ in plan.values():
+        write_if_changed(SHARED_DIR / name, content)
+    keep = {name for name, _, _ in plan.values()}
+    for stale in SHARED_DIR.glob("*") if SHARED_DIR.exists() else []:
+        if stale.name not in keep:
+            stale.unlink()
+    return {digest: name for digest, (name, _, _) in plan.items()}
+
+
+_worker = {}
+
+
+def _init_worker(mappings: dict, derivatives: dict, shared: dict, compare: bool):
+    _worker["mappings"] = mappings
+    _worker["derivatives"] = derivatives
+    _worker["shared"] = shared
+    _worker["rewriter"] = UrlRewriter(mappings)
+    _worker["hosts"] = {urlparse(url).netloc for url in mappings}
+    _worker["compare"] = compare
+
+
+def _rewrite_asset_job(job):
+    """Localize the URLs inside one downloaded script/stylesheet/JSON file.
+
+    Writes the rewritten copy to `dst` and returns True, or removes `dst` and returns
+    False when the file references no downloaded asset. Bytes that are not UTF-8 are
+    carried through unchanged.
+    """
+    src, dst = job
+    source = src.read_bytes().decode("utf-8", errors="surrogateescape")
+    text = _worker["rewriter"].rewrite_rooted(source)
+    if text == source:
+        dst.unlink(missing_ok=True)
+        return False
+    write_if_changed(dst, text.encode("utf-8", errors="surrogateescape"))
+    return True
+
+
+def _rewrite_page_job(job):
+    """Rewrite one page inside a worker; returns (single-pass s, sequential s or None, matches, minification).
+
+    The page is written minified, as minify_html.py would leave it, so that pass finds
+    nothing to do; minification is {"bytes", "saved"}, or None when the DOM check failed
+    and the page was written unminified.
+    """
+    src, dst = job
+    source = hoist_blocks(src.read_text(encoding="utf-8", errors="ignore"), dst, _worker["shared"])
+    source = add_derivative_srcsets(source, dst, _worker["derivatives"])
+    source = add_registration(source, to_relative(dst, OFFLINE / "sw.js").as_posix())
+
+    started = time.perf_counter()
+    text = _worker["rewriter"].rewrite(source, dst)
+    fast_seconds = time.perf_counter() - started
+
+    legacy_seconds = None
+    matches = True
+    if _worker["compare"]:
+        started = time.perf_counter()
+        expected = rewrite_sequential(source, dst, _worker["mappings"])
+        legacy_seconds = time.perf_counter() - started
+        matches = expected == text
+
+    text = drop_remote_hints(text, _worker["hosts"])
+    minified, problem = checked_minify(text)
+    minification = None
+    if problem is None:
+        size = len(minified.encode("utf-8"))
+        minification = {"bytes": size, "saved": len(text.encode("utf-8")) - size}
+        text = minified
+    write_if_changed(dst, text)
+    return fast_seconds, legacy_seconds, matches, minification
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rewrite mirrored pages to use local asset paths.")
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="also run the legacy per-asset replace loop, check output is identical and print timings",
+    )
+    add_jobs_argument(parser)
+    add_profile_argument(parser)
+    return parser.parse_args(argv)
+
+
 def main():
+    args = parse_args()
+    metrics = Metrics("build_offline_html", args.profile)
     assets = json.loads((ROOT / "content" / "assets.json").read_text(encoding="utf-8"))
     mappings = {}
     for item in assets.get("downloaded", []):
@@ -23,37 +341,141 @@ def main():
         local = ROOT / item["path"]
         mappings[url] = local
 
-    if OFFLINE.exists():
-        shutil.rmtree(OFFLINE)
     OFFLINE.mkdir(parents=True, exist_ok=True)
+    manifest = BuildManifest(ROOT)
+    derivatives = load_image_derivatives()
+    sources = {src: src.read_bytes() for src in site_pages(ROOT) if src.exists()}
 
-    html_files = [ROOT / "index.html"] + sorted((ROOT / "projects").glob("*/index.html")) + [ROOT / "projects" / "index.html"]
-
-    written = 0
-    for src in html_files:
-        if not src.exists():
+    # Asset pass: bundles and stylesheets reference fonts, images and other chunks by their
+    # absolute URLs, which would still go to the network when the offline page runs them.
+    asset_hash = sha256_json(
+        [OFFLINE_BUILD_VERSION] + [[url, str(local.relative_to(ROOT)), local.exists()] for url, local in mappings.items()]
+    )
+    asset_todo = []
+    copies = {}
+    for item in assets.get("downloaded", []):
+        local = ROOT / item["path"]
+        if local.suffix not in REWRITE_ASSET_SUFFIXES or not local.exists():
             continue
+        dst = OFFLINE / item["path"]
+        node_key = f"offline:{item['path']}"
+        node_inputs = {"source": item.get("sha256") or sha256_file(local), "assets": asset_hash}
+        value = manifest.lookup(node_key, node_inputs)
+        if value is not None and (not value["copied"] or manifest.fresh_output(node_key, node_inputs, dst)):
+            if value["copied"]:
+                copies[item["url"]] = dst
+            continue
+        asset_todo.append((item["url"], local, dst, node_key, node_inputs))
+    with metrics.stage("asset_rewrite"):
+        copied = map_pages(
+            _rewrite_asset_job,
+            [(local, dst) for _, local, dst, _, _ in asset_todo],
+            args.jobs,
+            initializer=_init_worker,
+            initargs=(mappings, {}, {}, False),
+        )
+    for (url, _, dst, node_key, node_inputs), was_copied in zip(asset_todo, copied):
+        if was_copied:
+            copies[url] = dst
+        manifest.record(node_key, node_inputs, {"copied": was_copied}, output=dst if was_copied else None)
+    # Pages load the localized copies.
+    mappings.update(copies)
+
+    # Cross-page pass: inline blocks repeated across pages become cacheable shared files.
+    with metrics.stage("shared_blocks"):
+        plan = plan_shared_blocks(
+            [data.decode("utf-8", errors="ignore") for data in sources.values()], UrlRewriter(mappings)
+        )
+        shared = write_shared_blocks(plan)
+
+    # Every offline page depends on the full URL -> local file mapping (and which files exist),
+    # on the available image derivatives and on which blocks are shared.
+    mapping_hash = sha256_json([asset_hash, derivatives, shared, sorted(str(dst.relative_to(ROOT)) for dst in copies.values())])
+
+    unchanged = 0
+    todo = []
+    for src, data in sources.items():
         rel = src.relative_to(ROOT)
         dst = OFFLINE / rel
-        dst.parent.mkdir(parents=True, exist_ok=True)
+        node_key = f"offline:{rel.as_posix()}"
+        node_inputs = {"source": sha256_bytes(data), "assets": mapping_hash}
+        if not args.compare and manifest.fresh_output(node_key, node_inputs, dst):
+            unchanged += 1
+            continue
+        todo.append((src, dst, node_key, node_inputs))
 
-        text = src.read_text(encoding="utf-8", errors="ignore")
+    with metrics.stage("offline_rewrite"):
+        results = map_pages(
+            _rewrite_page_job,
+            [(src, dst) for src, dst, _, _ in todo],
+            args.jobs,
+            initializer=_init_worker,
+            initargs=(mappings, derivatives, shared, args.compare),
+        )
 
-        for url, local in mappings.items():
-            if not local.exists():
-                continue
-            rel_local = str(to_relative(dst, local)).replace("\\", "/")
-            if not rel_local.startswith("."):
-                rel_local = "./" + rel_local
+    written = 0
+    mismatches = 0
+    fast_seconds = 0.0
+    legacy_seconds = 0.0
+    for (src, dst, node_key, node_inputs), (fast, legacy, matches, minification) in zip(todo, results):
+        fast_seconds += fast
+        if args.compare:
+            legacy_seconds += legacy
+            if not matches:
+                mismatches += 1
+                print(f"WARN rewrite mismatch: {src.relative_to(ROOT)}", file=sys.stderr)
+        manifest.record(node_key, node_inputs, output=dst)
+        if minification is not None:
+            manifest.record(f"minify:{dst.relative_to(ROOT).as_posix()}", {"version": MINIFY_VERSION}, minification, output=dst)
+        written += 1
 
-            escaped_url = html.escape(url, quote=True)
-            text = text.replace(url, rel_local)
-            text = text.replace(escaped_url, rel_local)
+    for stale in manifest.stale_outputs("offline:"):
+        stale.unlink(missing_ok=True)
+    manifest.save(prune_prefixes=("offline:",))
 
-        dst.write_text(text, encoding="utf-8")
-        written += 1
+    # Written every run: the page revisions are hashes of the offline files as they are now.
+    with metrics.stage("service_worker"):
+        precache, precache_bytes = precache_manifest(
+            ROOT,
+            OFFLINE,
+            assets.get("downloaded", []),
+            copies,
+            derivatives,
+            shared,
+            [OFFLINE / src.relative_to(ROOT) for src in sources],
+        )
+        write_service_worker(OFFLINE, precache)
 
     print(f"Offline HTML files written: {written}")
+    print(f"Offline HTML files unchanged: {unchanged}")
+    print(f"Offline asset copies with localized URLs: {len(copies)} ({len(asset_todo)} checked this run)")
+    shared_files = {
+        name: {"bytes": len(content.encode("utf-8")), "pages": pages} for name, content, pages in plan.values()
+    }
+    # Bytes no longer repeated inline: every page after the first fetches the file from cache.
+    dedup_bytes = sum(row["bytes"] * (row["pages"] - 1) for row in shared_files.values())
+    update_report(ROOT, "offline_shared_blocks", {"files": dict(sorted(shared_files.items())), "bytes_deduplicated": dedup_bytes})
+    print(f"Shared inline blocks: {len(plan)} files, {dedup_bytes} bytes deduplicated across pages")
+    update_report(
+        ROOT,
+        "service_worker",
+        {
+            "version": precache["version"],
+            "precache_entries": len(precache["precache"]),
+            "precache_bytes": precache_bytes,
+            "runtime_entries": len(precache["runtime"]),
+        },
+    )
+    print(
+        f"Service worker {precache['version']}: {len(precache['precache'])} precached files ({precache_bytes} bytes), "
+        f"{len(precache['runtime'])} cached on first use"
+    )
+    metrics.publish(ROOT)
+    if args.compare:
+        print(f"Rewrite time: single-pass {fast_seconds:.3f}s, sequential {legacy_seconds:.3f}s")
+        print(f"Rewrite mismatches: {mismatches}")
+        if mismatches:
+            sys.exit(1)
 
 
 if __name__ == "__main__":
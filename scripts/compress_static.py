@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+import argparse
+import gzip
+import os
+import sys
+from pathlib import Path
+
+from build_graph import BuildManifest, sha256_file, update_report, write_if_changed
+from instrumentation import Metrics, add_profile_argument
+from page_pool import add_jobs_argument, map_pages
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only .gz sidecars are written.
+    brotli = None
+
+ROOT = Path(__file__).resolve().parents[1]
+TEXT_SUFFIXES = {".html", ".mjs", ".js", ".css", ".json", ".ndjson", ".svg", ".txt", ".xml"}
+SIDECAR_EXTS = ("gz", "br")
+# Only what is deployed: the pages and files at the top level plus these trees. Walking
+# the whole checkout would also compress local tooling trees (.venv, node_modules).
+STATIC_DIRS = ("assets", "content", "offline", "projects")
+# Below this size the sidecar costs more in a request than it saves.
+MIN_BYTES = 1024
+# Bump when levels or the sidecar rules change so every sidecar is rewritten.
+COMPRESS_VERSION = 1
+
+
+def static_text_files():
+    candidates = [path for path in ROOT.iterdir() if path.is_file()]
+    for top in STATIC_DIRS:
+        for dirpath, dirnames, filenames in os.walk(ROOT / top):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            candidates += [Path(dirpath) / name for name in filenames]
+    files = [
+        path.relative_to(ROOT).as_posix()
+        for path in candidates
+        if path.suffix in TEXT_SUFFIXES and path.stat().st_size >= MIN_BYTES
+    ]
+    return sorted(files)
+
+
+def encoders():
+    found = {"gz": lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        found["br"] = lambda data: brotli.compress(data, quality=11, lgwin=24)
+    return found
+
+
+def compress_file(job):
+    """Write `<file>.gz`/`<file>.br` next to one file; returns {ext: compressed bytes}."""
+    rel, exts = job
+    data = (ROOT / rel).read_bytes()
+    available = encoders()
+    sizes = {}
+    for ext in SIDECAR_EXTS:
+        sidecar = ROOT / f"{rel}.{ext}"
+        packed = available[ext](data) if ext in exts else None
+        # Keep only sidecars that actually save bytes; servers fall back to the original.
+        # A sidecar whose encoder is unavailable is removed rather than left stale.
+        if packed is not None and len(packed) < len(data):
+            write_if_changed(sidecar, packed)
+            sizes[ext] = len(packed)
+        else:
+            sidecar.unlink(missing_ok=True)
+    return sizes
+
+
+def ratio_report(results: dict, exts) -> dict:
+    """Per file type: total bytes, bytes served per encoding, and compressed/original ratio."""
+    by_type = {}
+    for rel, (size, sizes) in sorted(results.items()):
+        row = by_type.setdefault(Path(rel).suffix, {"files": 0, "bytes": 0, **{f"{ext}_bytes": 0 for ext in exts}})
+        row["files"] += 1
+        row["bytes"] += size
+        for ext in exts:
+            # A missing sidecar means the file is served as-is.
+            row[f"{ext}_bytes"] += sizes.get(ext, size)
+    for row in by_type.values():
+        for ext in exts:
+            row[f"{ext}_ratio"] = round(row[f"{ext}_bytes"] / row["bytes"], 4)
+    return by_type
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Write .br/.gz sidecars for static text files.")
+    add_jobs_argument(parser)
+    add_profile_argument(parser)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    metrics = Metrics("compress_static", args.profile)
+    exts = sorted(encoders())
+    if brotli is None:
+        print("WARN brotli not installed; writing .gz sidecars only", file=sys.stderr)
+
+    manifest = BuildManifest(ROOT)
+    results = {}
+    todo = []
+    for rel in static_text_files():
+        node_key = f"compress:{rel}"
+        node_inputs = {"source": sha256_file(ROOT / rel), "formats": exts, "version": COMPRESS_VERSION}
+        sizes = manifest.lookup(node_key, node_inputs)
+        if sizes is not None and all((ROOT / f"{rel}.{ext}").exists() for ext in sizes):
+            results[rel] = ((ROOT / rel).stat().st_size, sizes)
+            continue
+        todo.append((rel, node_key, node_inputs))
+
+    with metrics.stage("compress"):
+        compressed = map_pages(compress_file, [(rel, exts) for rel, _, _ in todo], args.jobs)
+    for (rel, node_key, node_inputs), sizes in zip(todo, compressed):
+        manifest.record(node_key, node_inputs, sizes)
+        results[rel] = ((ROOT / rel).stat().st_size, sizes)
+
+    for key in manifest.stale_keys("compress:"):
+        rel = key[len("compress:"):]
+        for ext in SIDECAR_EXTS:
+            (ROOT / f"{rel}.{ext}").unlink(missing_ok=True)
+    manifest.save(prune_prefixes=("compress:",))
+
+    update_report(ROOT, "compression", ratio_report(results, exts))
+
+    print(f"Compressed files: {len(results)} ({len(todo)} updated, {len(results) - len(todo)} unchanged)")
+    print(f"Sidecar formats: {', '.join(exts)}")
+    metrics.publish(ROOT)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import mmap
+import struct
+from pathlib import Path
+
+from build_graph import write_if_changed
+
+STORE_DIR = Path("content") / "store"
+PAGES_FILE = "pages.ndjson"
+SHARED_FILE = "shared.ndjson"
+SHARED_INDEX_FILE = "shared.idx"
+INDEX_FILE = "pages.idx"
+# Normalized record fields: lists of objects stored once in shared.ndjson and referenced by ID.
+SHARED_FIELDS = ("links", "images")
+INDEX_MAGIC = b"PGIDX001"
+INDEX_HEADER = struct.Struct("<8sII")  # magic, slot count, page count
+INDEX_SLOT = struct.Struct("<QQI")  # path key (0 = empty), byte offset, byte length
+SHARED_MAGIC = b"SHIDX001"
+SHARED_HEADER = struct.Struct("<8s" + "I" * len(SHARED_FIELDS))  # magic, item count per field
+SHARED_SLOT = struct.Struct("<QI")  # byte offset, byte length; slot = ID, fields in order
+
+
+def path_key(path: str) -> int:
+    # Never 0, which marks an empty slot.
+    return int.from_bytes(hashlib.sha1(path.encode("utf-8")).digest()[:8], "little") | 1
+
+
+def normalize(pages):
+    """Split pages into (records with ID lists, shared tables of unique link/image objects)."""
+    shared = {field: [] for field in SHARED_FIELDS}
+    ids = {field: {} for field in SHARED_FIELDS}
+    records = []
+    for page in pages:
+        record = dict(page)
+        for field in SHARED_FIELDS:
+            refs = []
+            for item in page.get(field, []):
+                key = json.dumps(item, sort_keys=True)
+                if key not in ids[field]:
+                    ids[field][key] = len(shared[field])
+                    shared[field].append(item)
+                refs.append(ids[field][key])
+            record[field] = refs
+        records.append(record)
+    return records, shared
+
+
+def build_index(entries) -> bytes:
+    """Open-addressing hash table over (path, offset, length) with ~50% load."""
+    slots = max(8, 1 << (2 * len(entries) - 1).bit_length())
+    table = [None] * slots
+    for path, offset, length in entries:
+        key = path_key(path)
+        i = key % slots
+        while table[i] is not None:
+            i = (i + 1) % slots
+        table[i] = (key, offset, length)
+    out = bytearray(INDEX_HEADER.pack(INDEX_MAGIC, slots, len(entries)))
+    for slot in table:
+        out += INDEX_SLOT.pack(*(slot or (0, 0, 0)))
+    return bytes(out)
+
+
+def ndjson(values):
+    """(NDJSON bytes, [(offset, length) per value]), lengths without the newline."""
+    lines = []
+    spans = []
+    offset = 0
+    for value in values:
+        line = (json.dumps(value, ensure_ascii=True, separators=(",", ":")) + "\n").encode("ascii")
+        spans.append((offset, len(line) - 1))
+        lines.append(line)
+        offset += len(line)
+    return b"".join(lines), spans
+
+
+def write_store(root: Path, pages) -> int:
+    """Write the normalized NDJSON store, shared table and indexes; returns total bytes."""
+    records, shared = normalize(pages)
+    data, spans = ndjson(records)
+    shared_data, shared_spans = ndjson(item for field in SHARED_FIELDS for item in shared[field])
+    shared_index = bytearray(SHARED_HEADER.pack(SHARED_MAGIC, *(len(shared[field]) for field in SHARED_FIELDS)))
+    for span in shared_spans:
+        shared_index += SHARED_SLOT.pack(*span)
+    store = root / STORE_DIR
+    payloads = {
+        PAGES_FILE: data,
+        INDEX_FILE: build_index([(record["path"], *span) for record, span in zip(records, spans)]),
+        SHARED_FILE: shared_data,
+        SHARED_INDEX_FILE: bytes(shared_index),
+    }
+    for name, payload in payloads.items():
+        write_if_changed(store / name, payload)
+    # The shared table used to be one JSON document that had to be parsed whole.
+    (store / "shared.json").unlink(missing_ok=True)
+    return sum(len(p) for p in payloads.values())
+
+
+class ContentStore:
+    """Read single page records without parsing the rest of the content.
+
+    The index and NDJSON files are memory-mapped; `page(path)` hashes the path, probes the
+    index and decodes one line, then decodes one shared.ndjson line per link/image ID it
+    refers to, found by position in shared.idx.
+
+        with ContentStore(root) as store:
+            record = store.page("/projects/city-services")
+    """
+
+    def __init__(self, root: Path):
+        directory = root / STORE_DIR
+        self._files = []
+        self._index = self._map(directory / INDEX_FILE)
+        self._data = self._map(directory / PAGES_FILE)
+        self._shared_index = self._map(directory / SHARED_INDEX_FILE)
+        self._shared_data = self._map(directory / SHARED_FILE)
+        magic, self.slots, self.count = INDEX_HEADER.unpack_from(self._index, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"not a page index: {directory / INDEX_FILE}")
+        magic, *counts = SHARED_HEADER.unpack_from(self._shared_index, 0)
+        if magic != SHARED_MAGIC:
+            raise ValueError(f"not a shared index: {directory / SHARED_INDEX_FILE}")
+        # First slot of each field's IDs.
+        self._shared_base = {}
+        base = 0
+        for field, count in zip(SHARED_FIELDS, counts):
+            self._shared_base[field] = base
+            base += count
+
+    def _map(self, path: Path):
+        fh = path.open("rb")
+        self._files.append(fh)
+        if path.stat().st_size == 0:
+            return b""
+        return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _slot(self, i: int):
+        return INDEX_SLOT.unpack_from(self._index, INDEX_HEADER.size + i * INDEX_SLOT.size)
+
+    def raw(self, path: str):
+        """The normalized record for `path` (links/images as IDs), or None."""
+        key = path_key(path)
+        i = key % self.slots
+        while True:
+            slot_key, offset, length = self._slot(i)
+            if slot_key == 0:
+                return None
+            if slot_key == key:
+                record = json.loads(self._data[offset:offset + length])
+                if record["path"] == path:
+                    return record
+            i = (i + 1) % self.slots
+
+    def page(self, path: str):
+        """The record for `path` exactly as it appears in pages.json, or None."""
+        record = self.raw(path)
+        if record is None:
+            return None
+        for field in SHARED_FIELDS:
+            record[field] = [self.shared(field, i) for i in record[field]]
+        return record
+
+    def shared(self, field: str, item_id: int):
+        """One shared link/image object by its ID."""
+        offset, length = SHARED_SLOT.unpack_from(
+            self._shared_index, SHARED_HEADER.size + (self._shared_base[field] + item_id) * SHARED_SLOT.size
+        )
+        return json.loads(self._shared_data[offset:offset + length])
+
+    def paths(self):
+        """Every stored page path, in NDJSON (pages.json) order."""
+        found = sorted(self._slot(i)[1:] for i in range(self.slots) if self._slot(i)[0])
+        return [json.loads(self._data[offset:offset + length])["path"] for offset, length in found]
+
+    def close(self):
+        for mapped in (self._index, self._data, self._shared_index, self._shared_data):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        for fh in self._files:
+            fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,88 @@
+import struct
+from pathlib import Path
+
+# Enough for the size fields of every format below; JPEG SOF markers can sit behind large
+# EXIF/ICC segments, so JPEG falls back to reading the rest of the file.
+HEADER_BYTES = 64 * 1024
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _png(data: bytes):
+    if len(data) >= 24 and data[12:16] == b"IHDR":
+        return struct.unpack(">II", data[16:24])
+    return None
+
+
+def _gif(data: bytes):
+    if len(data) >= 10:
+        return struct.unpack("<HH", data[6:10])
+    return None
+
+
+def _jpeg(data: bytes):
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        if marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None
+
+
+def _webp(data: bytes):
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30:
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25:
+        bits = int.from_bytes(data[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        return int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+    return None
+
+
+def _avif(data: bytes):
+    # The first 'ispe' (image spatial extents) property belongs to the primary item.
+    i = data.find(b"ispe")
+    if i != -1 and i + 16 <= len(data):
+        return struct.unpack(">II", data[i + 8:i + 16])
+    return None
+
+
+def sniff(data: bytes):
+    """(width, height) from the leading bytes of a PNG/JPEG/GIF/WebP/AVIF file, or None."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return _png(data)
+    if data.startswith(b"\xff\xd8"):
+        return _jpeg(data)
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return _gif(data)
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return _webp(data)
+    if data[4:12] in (b"ftypavif", b"ftypavis"):
+        return _avif(data)
+    return None
+
+
+def image_size(path: Path):
+    """Intrinsic (width, height) of an image file, read from its header without decoding it."""
+    try:
+        with path.open("rb") as fh:
+            data = fh.read(HEADER_BYTES)
+            size = sniff(data)
+            if size is None and data.startswith(b"\xff\xd8"):
+                size = sniff(data + fh.read())
+    except OSError:
+        return None
+    return size
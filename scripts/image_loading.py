@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+import argparse
+import base64
+import html
+import io
+import json
+import re
+import sys
+from pathlib import Path
+
+from build_graph import BuildManifest, sha256_json, site_pages, update_report, write_if_changed
+from instrumentation import Metrics, add_profile_argument
+from page_pool import add_jobs_argument, map_pages
+
+try:
+    from PIL import Image, ImageFilter, ImageOps
+except ImportError:  # Pillow is optional; without it pages get no placeholders.
+    Image = None
+
+ROOT = Path(__file__).resolve().parents[1]
+# Bump when the loading rules or placeholder encoding change so every page is redone.
+IMAGE_LOADING_VERSION = 1
+# Framer renders each section once per breakpoint, so position is counted in distinct
+# sources: the first few cover the first viewport at every width.
+EAGER_SOURCES = 3
+# Images drawn at most this wide (logos, icons) are never the LCP element.
+SMALL_IMAGE_PX = 64
+LQIP_SIZE = 16
+IMG_TAG_RE = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+IMG_SRC_RE = re.compile(r'\ssrc="([^"]*)"', re.IGNORECASE)
+IMG_SIZES_RE = re.compile(r'\ssizes="([^"]*)"', re.IGNORECASE)
+IMG_STYLE_RE = re.compile(r'\sstyle="([^"]*)"', re.IGNORECASE)
+PX_RE = re.compile(r"^(\d+(?:\.\d+)?)px$")
+
+
+def has_attr(tag: str, name: str) -> bool:
+    return re.search(rf"\s{name}=", tag, re.IGNORECASE) is not None
+
+
+def img_src(tag: str):
+    src = IMG_SRC_RE.search(tag)
+    return html.unescape(src.group(1)) if src else None
+
+
+def is_small(tag: str) -> bool:
+    """True when every `sizes` entry is a px length of at most SMALL_IMAGE_PX."""
+    sizes = IMG_SIZES_RE.search(tag)
+    if not sizes:
+        return False
+    lengths = [entry.split()[-1] for entry in sizes.group(1).split(",") if entry.split()]
+    widths = [PX_RE.match(length) for length in lengths]
+    return bool(widths) and all(w and float(w.group(1)) <= SMALL_IMAGE_PX for w in widths)
+
+
+def eager_sources(text: str):
+    """(sources loaded eagerly, those of them drawn larger than an icon) for one page.
+
+    The first large source is the LCP candidate.
+    """
+    eager = []
+    large = []
+    for tag in IMG_TAG_RE.findall(text):
+        src = img_src(tag)
+        if src is None:
+            continue
+        if src not in eager:
+            if len(eager) == EAGER_SOURCES:
+                break
+            eager.append(src)
+        if src not in large and not is_small(tag):
+            large.append(src)
+    return eager, large
+
+
+def make_placeholder(path: Path) -> str:
+    """A blurred LQIP_SIZE px data: URI of an opaque image, or "" for images with transparency.
+
+    A transparent image would show the placeholder through it once loaded.
+    """
+    try:
+        with Image.open(path) as img:
+            img.draft("RGB", (LQIP_SIZE * 8, LQIP_SIZE * 8))  # JPEGs decode at a fraction of full size
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((LQIP_SIZE, LQIP_SIZE))
+            if img.mode in ("RGBA", "LA", "PA", "P") or "transparency" in img.info:
+                img = img.convert("RGBA")
+                if img.getchannel("A").getextrema()[0] < 255:
+                    return ""
+            img = img.convert("RGB").filter(ImageFilter.GaussianBlur(1))
+            Image.init()
+            fmt = "WEBP" if "WEBP" in Image.SAVE else "PNG"
+            buf = io.BytesIO()
+            img.save(buf, fmt, quality=30)
+    except (OSError, ValueError):
+        return ""
+    return f"data:image/{fmt.lower()};base64,{base64.b64encode(buf.getvalue()).decode('ascii')}"
+
+
+_worker = {}
+
+
+def _init_worker(assets: dict, placeholders: dict):
+    _worker["assets"] = assets
+    _worker["placeholders"] = placeholders
+
+
+def load_page(page: Path):
+    """Set loading/fetchpriority/size attributes and placeholders on one page's <img> tags.
+
+    Returns counts for the report. Attributes the page already has are kept, so a second
+    run changes nothing.
+    """
+    text = page.read_text(encoding="utf-8", errors="ignore")
+    eager, large = eager_sources(text)
+    hero = large[0] if large else None
+    counts = {"lazy": 0, "eager": 0, "high_priority": 0, "sized": 0, "placeholders": 0, "lazy_source_bytes": 0}
+    lazy_sources = set()
+
+    def edit(m):
+        tag = m.group(0)
+        src = img_src(tag)
+        asset = _worker["assets"].get(src)
+        extra = []
+        if src in eager:
+            counts["eager"] += 1
+            if src == hero:
+                counts["high_priority"] += 1
+                if not has_attr(tag, "fetchpriority"):
+                    extra.append('fetchpriority="high"')
+            placeholder = _worker["placeholders"].get(asset["sha256"]) if asset and src in large else None
+            style = IMG_STYLE_RE.search(tag)
+            if placeholder and not (style and "data:image" in style.group(1)):
+                background = f"background:center/cover no-repeat url({placeholder})"
+                if style:
+                    tag = tag[:style.end(1)] + ("" if style.group(1).endswith(";") else ";") + background + tag[style.end(1):]
+                else:
+                    extra.append(f'style="{background}"')
+            counts["placeholders"] += bool(placeholder)
+        else:
+            counts["lazy"] += 1
+            if not has_attr(tag, "loading"):
+                extra.append('loading="lazy"')
+            if src and src not in lazy_sources:
+                lazy_sources.add(src)
+                counts["lazy_source_bytes"] += asset["bytes"] if asset else 0
+        if not has_attr(tag, "decoding"):
+            extra.append('decoding="async"')
+        if asset and "width" in asset and not (has_attr(tag, "width") or has_attr(tag, "height")):
+            extra.append(f'width="{asset["width"]}" height="{asset["height"]}"')
+            counts["sized"] += 1
+        return "<img " + " ".join(extra) + tag[4:] if extra else tag
+
+    write_if_changed(page, IMG_TAG_RE.sub(edit, text))
+    return counts
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Add lazy-loading, priority, size and placeholder attributes to page images.")
+    add_jobs_argument(parser)
+    add_profile_argument(parser)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    metrics = Metrics("image_loading", args.profile)
+    if Image is None:
+        print("WARN Pillow not installed; skipping image placeholders", file=sys.stderr)
+    downloaded = json.loads((ROOT / "content" / "assets.json").read_text(encoding="utf-8")).get("downloaded", [])
+    assets = {item["url"]: item for item in downloaded if "width" in item}
+    manifest = BuildManifest(ROOT)
+    node_inputs = {
+        "version": IMAGE_LOADING_VERSION,
+        "images": sha256_json([[url, item["sha256"], item["width"], item["height"]] for url, item in sorted(assets.items())]),
+        "placeholders": Image is not None,
+    }
+    results = {}
+    todo = []
+    needed = {}
+    for page in site_pages(ROOT):
+        if not page.exists():
+            continue
+        rel = page.relative_to(ROOT).as_posix()
+        node_key = f"loading:{rel}"
+        if manifest.fresh_output(node_key, node_inputs, page):
+            results[rel] = manifest.nodes[node_key]["value"]
+            continue
+        todo.append((page, rel, node_key))
+        _, large = eager_sources(page.read_text(encoding="utf-8", errors="ignore"))
+        for src in large if Image is not None else ():
+            if src in assets:
+                needed[assets[src]["sha256"]] = ROOT / assets[src]["path"]
+
+    # Placeholders are keyed by image content, so a reused image is only decoded once.
+    placeholders = {}
+    pending = []
+    for digest, path in needed.items():
+        value = manifest.lookup(f"lqip:{digest}", {"version": IMAGE_LOADING_VERSION, "size": LQIP_SIZE})
+        if value is None:
+            pending.append((digest, path))
+        else:
+            placeholders[digest] = value
+    with metrics.stage("placeholders"):
+        made = map_pages(make_placeholder, [path for _, path in pending], args.jobs)
+    for (digest, _), uri in zip(pending, made):
+        manifest.record(f"lqip:{digest}", {"version": IMAGE_LOADING_VERSION, "size": LQIP_SIZE}, uri)
+        placeholders[digest] = uri
+
+    with metrics.stage("image_loading"):
+        counted = map_pages(
+            load_page, [page for page, _, _ in todo], args.jobs, initializer=_init_worker, initargs=(assets, placeholders)
+        )
+    for (page, rel, node_key), counts in zip(todo, counted):
+        results[rel] = counts
+        manifest.record(node_key, node_inputs, counts, output=page)
+    # lqip: nodes of images no page needed this run stay; they are tiny and pages come back.
+    manifest.save(prune_prefixes=("loading:",))
+
+    totals = {key: sum(row[key] for row in results.values()) for key in ("lazy", "eager", "high_priority", "sized", "placeholders", "lazy_source_bytes")}
+    update_report(ROOT, "image_loading", {"pages": dict(sorted(results.items())), **totals})
+    print(f"Pages: {len(results)} ({len(todo)} checked this run)")
+    print(f"Images: {totals['eager']} eager ({totals['high_priority']} fetchpriority=high, {totals['placeholders']} with placeholder), {totals['lazy']} lazy")
+    print(f"Original image bytes behind loading=lazy: {totals['lazy_source_bytes']}")
+    metrics.publish(ROOT)
+
+
+if __name__ == "__main__":
+    main()
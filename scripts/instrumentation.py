@@ -0,0 +1,141 @@
+import cProfile
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlparse
+
+from build_graph import update_report
+
+PROFILE_DIR = Path(".cache") / "profiles"
+SLOWEST_URLS = 10
+
+
+def add_profile_argument(parser):
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=f"write cProfile stats per stage to {PROFILE_DIR}/<script>-<stage>.pstats (main thread only)",
+    )
+
+
+def _children_cpu() -> float:
+    # Process-pool workers are only counted here once they have exited and been reaped.
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def percentile(values, q: float) -> float:
+    """Percentile of an already sorted list: the value at the rounded linear index q% of the way through."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))]
+
+
+class Metrics:
+    """Stage timings, per-request latency and cache byte counters for one script run.
+
+    Stages may be entered repeatedly (e.g. once per crawl level); their times accumulate.
+    With `profile`, each stage also gets its own cProfile profiler, dumped by `finish()`.
+    """
+
+    def __init__(self, script: str, profile: bool = False):
+        self.script = script
+        self.profile = profile
+        self.stages = {}
+        self.requests = []
+        self.cached_bytes = 0
+        self.cached_responses = 0
+        self._profilers = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        profiler = None
+        if self.profile:
+            profiler = self._profilers.setdefault(name, cProfile.Profile())
+            profiler.enable()
+        wall = time.perf_counter()
+        cpu = time.process_time() + _children_cpu()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            row = self.stages.setdefault(name, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "calls": 0})
+            row["wall_seconds"] += time.perf_counter() - wall
+            row["cpu_seconds"] += time.process_time() + _children_cpu() - cpu
+            row["calls"] += 1
+
+    def record_request(self, url: str, seconds: float, nbytes: int, status: int):
+        with self._lock:
+            self.requests.append((seconds, url, nbytes, status))
+
+    def record_cache_hit(self, nbytes: int):
+        with self._lock:
+            self.cached_bytes += nbytes
+            self.cached_responses += 1
+
+    def report(self) -> dict:
+        out = {
+            "stages": {
+                name: {
+                    "wall_seconds": round(row["wall_seconds"], 4),
+                    "cpu_seconds": round(row["cpu_seconds"], 4),
+                    "calls": row["calls"],
+                }
+                for name, row in self.stages.items()
+            }
+        }
+        if not self.requests and not self.cached_responses:
+            return out
+        by_host = {}
+        for seconds, url, nbytes, _ in self.requests:
+            host = by_host.setdefault(urlparse(url).netloc, {"latencies": [], "bytes": 0})
+            host["latencies"].append(seconds)
+            host["bytes"] += nbytes
+        hosts = {}
+        for name, host in sorted(by_host.items()):
+            lat = sorted(host["latencies"])
+            hosts[name] = {
+                "requests": len(lat),
+                "bytes": host["bytes"],
+                "p50_ms": round(percentile(lat, 50) * 1000, 1),
+                "p90_ms": round(percentile(lat, 90) * 1000, 1),
+                "p99_ms": round(percentile(lat, 99) * 1000, 1),
+                "max_ms": round(lat[-1] * 1000, 1),
+            }
+        slowest = sorted(self.requests, key=lambda r: r[0], reverse=True)[:SLOWEST_URLS]
+        out.update({
+            "requests": len(self.requests),
+            "bytes_transferred": sum(r[2] for r in self.requests),
+            "bytes_from_cache": self.cached_bytes,
+            "responses_from_cache": self.cached_responses,
+            "hosts": hosts,
+            "slowest_urls": [
+                {"url": url, "ms": round(seconds * 1000, 1), "bytes": nbytes, "status": status}
+                for seconds, url, nbytes, status in slowest
+            ],
+        })
+        return out
+
+    def summary(self) -> str:
+        return ", ".join(f"{name} {row['wall_seconds']:.2f}s" for name, row in self.stages.items())
+
+    def finish(self, root: Path):
+        """Dump per-stage profiles (when enabled); returns the written paths."""
+        written = []
+        for name, profiler in self._profilers.items():
+            path = root / PROFILE_DIR / f"{self.script}-{name}.pstats"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(str(path))
+            written.append(path)
+        return written
+
+    def publish(self, root: Path):
+        """Record the report under performance.<script>, print the timing line and dump profiles."""
+        update_report(root, ("performance", self.script), self.report())
+        print(f"Timing: {self.summary()}")
+        for profile_path in self.finish(root):
+            print(f"Profile: {profile_path.relative_to(root)}")
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import re
+import sys
+from html.parser import HTMLParser
+from pathlib import Path
+
+from build_graph import BuildManifest, site_pages, update_report, write_if_changed
+from instrumentation import Metrics, add_profile_argument
+from page_pool import add_jobs_argument, map_pages
+
+ROOT = Path(__file__).resolve().parents[1]
+OFFLINE = ROOT / "offline"
+# Bump when the minification rules change so every page is minified again.
+MINIFY_VERSION = 1
+# apply_seo_geo.inject_jsonld anchors the JSON-LD block at the headEnd marker, and React
+# needs its Suspense/text-separator comments to hydrate Framer's server-rendered markup.
+PRESERVED_COMMENTS = {"<!-- Start of headEnd -->", "<!--$-->", "<!--/$-->", "<!--$?-->", "<!--$!-->", "<!-- -->"}
+CONDITIONAL_COMMENT_RE = re.compile(r"<!--\[if\b|<!\[endif\]", re.IGNORECASE)
+# Attribute values may contain '>', so tags are matched quote-aware.
+_ATTRS = r"""(?:[^>"']|"[^"]*"|'[^']*')*"""
+HTML_TOKEN_RE = re.compile(
+    r"<!--.*?-->"
+    rf"|<(?P<raw>script|style|textarea|pre|title)(?=[\s/>]){_ATTRS}>(?P<body>.*?)</(?P=raw)\s*>"
+    rf"|<(?P<close>/?)(?P<tag>[a-zA-Z][^\s/>]*){_ATTRS}>"
+    rf"|<!{_ATTRS}>"
+    r"|[^<]+|<",
+    re.DOTALL | re.IGNORECASE,
+)
+JSONLD_TYPE_RE = re.compile(r"""\btype\s*=\s*["']?application/ld\+json""", re.IGNORECASE)
+CSS_TOKEN_RE = re.compile(
+    r'"(?:[^"\\]|\\.)*"'
+    r"|'(?:[^'\\]|\\.)*'"
+    r"|/\*.*?\*/"
+    r"|url\([^\"')]*\)"
+    r"|\s+"
+    r"|[^\"'/\s{};,:()]+"
+    r"|.",
+    re.DOTALL | re.IGNORECASE,
+)
+# Whitespace next to these never separates two CSS tokens ("a , b" == "a,b"); a space
+# before ':' is kept because it is a descendant combinator in selectors ("a :hover").
+CSS_NO_SPACE_AFTER = set("{};,:(")
+CSS_NO_SPACE_BEFORE = set("{};,)")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def minify_css(css: str) -> str:
+    """Drop comments and insignificant whitespace; strings and url() tokens are kept verbatim."""
+    out = []
+    space = False
+    for tok in CSS_TOKEN_RE.findall(css):
+        if tok.startswith("/*"):
+            continue
+        if tok.isspace():
+            space = True
+            continue
+        if space and out and out[-1] not in CSS_NO_SPACE_AFTER and tok not in CSS_NO_SPACE_BEFORE:
+            out.append(" ")
+        space = False
+        if tok == "}" and out and out[-1] == ";":
+            out.pop()
+        out.append(tok)
+    return "".join(out)
+
+
+def css_tokens(css: str):
+    """Non-whitespace CSS tokens, without comments or the optional ';' before '}'."""
+    tokens = [t for t in CSS_TOKEN_RE.findall(css) if not t.isspace() and not t.startswith("/*")]
+    return [t for i, t in enumerate(tokens) if not (t == ";" and tokens[i + 1:i + 2] == ["}"])]
+
+
+def minify_jsonld(text: str) -> str:
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return text
+    # Same serialization apply_seo_geo uses, with "</" escaped so a string can't end the script.
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+
+
+def minify_html(text: str) -> str:
+    """Minify one page without changing how it renders or hydrates.
+
+    Comments go (except PRESERVED_COMMENTS and conditional comments), whitespace-only runs
+    between tags are dropped in <head> and collapsed to one character elsewhere, and inline
+    CSS and JSON-LD are minified. Text content, attributes, other scripts and
+    <pre>/<textarea>/<title> are copied unchanged. Running it twice changes nothing.
+    """
+    out = []
+    in_head = True
+    gap = ""
+    for m in HTML_TOKEN_RE.finditer(text):
+        tok = m.group(0)
+        if tok.isspace():
+            # Runs split by dropped comments collapse into one.
+            gap = "\n" if "\n" in tok + gap else " "
+            continue
+        if tok.startswith("<!--") and not (tok in PRESERVED_COMMENTS or CONDITIONAL_COMMENT_RE.match(tok)):
+            continue
+        if gap and not in_head:
+            out.append(gap)
+        gap = ""
+        raw = m.group("raw")
+        if raw:
+            start, end = m.start("body") - m.start(), m.end("body") - m.start()
+            body = m.group("body")
+            raw = raw.lower()
+            if raw == "style":
+                body = minify_css(body)
+            elif raw == "script" and JSONLD_TYPE_RE.search(tok[:start]):
+                body = minify_jsonld(body)
+            out.append(tok[:start] + body + tok[end:])
+            continue
+        tag = m.group("tag")
+        if tag:
+            tag = tag.lower()
+            if tag == "body" or (tag == "head" and m.group("close")):
+                in_head = False
+        out.append(tok)
+    if gap and not in_head:
+        out.append(gap)
+    return "".join(out)
+
+
+class DomSignature(HTMLParser):
+    """Flattened DOM events from the stdlib parser, normalized the way browsers render them.
+
+    Adjacent text is merged and whitespace-collapsed (verbatim inside <pre>/<textarea>),
+    whitespace-only text in <head> is ignored, comments other than PRESERVED_COMMENTS are
+    ignored, <style> is compared as CSS tokens and JSON-LD as parsed JSON.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.events = []
+        self.text = []
+        self.in_head = True
+        self.verbatim = 0
+        self.raw_kind = None
+
+    def flush(self):
+        text = "".join(self.text)
+        self.text = []
+        if not text:
+            return
+        if self.raw_kind == "style":
+            self.events.append(("css", css_tokens(text)))
+        elif self.raw_kind == "jsonld":
+            try:
+                self.events.append(("json", json.loads(text)))
+            except ValueError:
+                self.events.append(("text", text))
+        elif self.raw_kind or self.verbatim:
+            self.events.append(("text", text))
+        elif not text.isspace():
+            self.events.append(("text", WHITESPACE_RE.sub(" ", text)))
+        elif not self.in_head:
+            self.events.append(("text", " "))
+
+    def handle_starttag(self, tag, attrs):
+        self.flush()
+        if tag == "body":
+            self.in_head = False
+        if tag in ("pre", "textarea"):
+            self.verbatim += 1
+        if tag == "style":
+            self.raw_kind = "style"
+        elif tag == "script":
+            jsonld = any(k == "type" and (v or "").lower() == "application/ld+json" for k, v in attrs)
+            self.raw_kind = "jsonld" if jsonld else "script"
+        self.events.append(("start", tag, attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.flush()
+        self.events.append(("start", tag, attrs))
+
+    def handle_endtag(self, tag):
+        self.flush()
+        if tag == "head":
+            self.in_head = False
+        if tag in ("pre", "textarea") and self.verbatim:
+            self.verbatim -= 1
+        if tag in ("style", "script"):
+            self.raw_kind = None
+        self.events.append(("end", tag))
+
+    def handle_data(self, data):
+        self.text.append(data)
+
+    def handle_comment(self, data):
+        if f"<!--{data}-->" in PRESERVED_COMMENTS:
+            self.flush()
+            self.events.append(("comment", data))
+
+    def handle_decl(self, decl):
+        self.flush()
+        self.events.append(("decl", decl.lower()))
+
+    @classmethod
+    def of(cls, text: str):
+        parser = cls()
+        parser.feed(text)
+        parser.close()
+        parser.flush()
+        return parser.events
+
+
+def first_difference(a, b) -> str:
+    for i, (x, y) in enumerate(zip(a, b)):
+        if x != y:
+            return f"event {i}: {str(x)[:120]} != {str(y)[:120]}"
+    return f"event count {len(a)} != {len(b)}"
+
+
+def html_pages():
+    """Deployed pages and their offline copies, as paths relative to the repo root."""
+    pages = []
+    for base in (ROOT, OFFLINE):
+        pages += [p.relative_to(ROOT).as_posix() for p in site_pages(base) if p.exists()]
+    return pages
+
+
+def checked_minify(original: str):
+    """(minified text, None), or (minified text, first difference) when it is not DOM-equivalent."""
+    minified = minify_html(original)
+    if minify_html(minified) != minified:
+        return minified, "minification is not idempotent"
+    before, after = DomSignature.of(original), DomSignature.of(minified)
+    return minified, first_difference(before, after) if before != after else None
+
+
+def minify_page(job):
+    """Minify one page in place, verifying DOM equivalence first.
+
+    Returns (bytes before, bytes after, None) or, when the comparison fails, the page is
+    left untouched and the third item describes the first difference.
+    """
+    rel, write = job
+    path = ROOT / rel
+    original = path.read_text(encoding="utf-8", errors="ignore")
+    minified, problem = checked_minify(original)
+    if write and problem is None:
+        write_if_changed(path, minified)
+    return len(original.encode("utf-8")), len(minified.encode("utf-8")), problem
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Minify the deployed and offline HTML pages in place.")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="only verify every page minifies to a DOM-equivalent document; exit 1 otherwise",
+    )
+    add_jobs_argument(parser)
+    add_profile_argument(parser)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    metrics = Metrics("minify_html", args.profile)
+    manifest = BuildManifest(ROOT)
+    node_inputs = {"version": MINIFY_VERSION}
+    results = {}
+    todo = []
+    for rel in html_pages():
+        node_key = f"minify:{rel}"
+        if not args.check and manifest.fresh_output(node_key, node_inputs, ROOT / rel):
+            results[rel] = manifest.nodes[node_key]["value"]
+            continue
+        todo.append((rel, node_key))
+
+    with metrics.stage("minify"):
+        minified = map_pages(minify_page, [(rel, not args.check) for rel, _ in todo], args.jobs)
+    failures = 0
+    for (rel, node_key), (before, after, problem) in zip(todo, minified):
+        if problem is not None:
+            failures += 1
+            print(f"WARN {rel} not minified, DOM differs: {problem}", file=sys.stderr)
+            continue
+        results[rel] = {"bytes": after, "saved": before - after}
+        if not args.check:
+            manifest.record(node_key, node_inputs, results[rel], output=ROOT / rel)
+
+    if args.check:
+        print(f"DOM-equivalent pages: {len(results)}/{len(todo)}")
+        for rel, row in sorted(results.items()):
+            print(f"  {rel}: {row['saved']} bytes saved")
+        sys.exit(1 if failures else 0)
+
+    manifest.save(prune_prefixes=("minify:",))
+    saved = sum(row["saved"] for row in results.values())
+    update_report(ROOT, "html_minification", {"pages": dict(sorted(results.items())), "bytes_saved": saved})
+    rewritten = sum(1 for rel, _ in todo if results.get(rel, {}).get("saved"))
+    print(f"Minified pages: {len(results)} ({rewritten} rewritten, {len(results) - rewritten} already minified)")
+    print(f"Bytes saved: {saved}")
+    metrics.publish(ROOT)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_JOBS = os.cpu_count() or 1
+
+
+def add_jobs_argument(parser):
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=DEFAULT_JOBS,
+        help=f"worker processes for per-page work (default: {DEFAULT_JOBS}; 1 runs in-process)",
+    )
+
+
+def map_pages(fn, jobs, workers: int = DEFAULT_JOBS, initializer=None, initargs=()):
+    """Run `fn(job)` for every job, across processes when it pays off.
+
+    Results come back in input order regardless of completion order, so callers that
+    build JSON or reports from them stay deterministic. `fn` and `initializer` must be
+    module-level functions so they can be pickled.
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return []
+    if workers <= 1 or len(jobs) < 2:
+        if initializer is not None:
+            initializer(*initargs)
+        return [fn(job) for job in jobs]
+    workers = min(workers, len(jobs))
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        return list(pool.map(fn, jobs, chunksize=chunksize))
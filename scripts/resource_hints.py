@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+import argparse
+import html
+import json
+import re
+from collections import Counter
+from pathlib import Path
+from urllib.parse import urljoin, urlparse
+
+from apply_seo_geo import HeadPatch, SITE_URL
+from build_graph import BuildManifest, sha256_json, site_pages, update_report, write_if_changed
+from instrumentation import Metrics, add_profile_argument
+from page_pool import add_jobs_argument, map_pages
+
+ROOT = Path(__file__).resolve().parents[1]
+# Bump when hint selection changes so every page is re-hinted.
+RESOURCE_HINTS_VERSION = 1
+# Each font preload competes with the LCP image for bandwidth; only the most used faces qualify.
+MAX_FONT_PRELOADS = 3
+HINT_LINK_RE = re.compile(r"<link\b[^>]*>", re.IGNORECASE)
+LINK_REL_RE = re.compile(r'\srel="([^"]*)"', re.IGNORECASE)
+LINK_HREF_RE = re.compile(r'\shref="([^"]*)"', re.IGNORECASE)
+MODULE_SCRIPT_RE = re.compile(r'<script\b[^>]*\stype="module"[^>]*>', re.IGNORECASE)
+SCRIPT_SRC_RE = re.compile(r'\ssrc="([^"]*)"', re.IGNORECASE)
+# Static imports only ("import{a}from"./x.mjs"", "import"./x.mjs"", "export*from"...");
+# import() chunks load on demand and are not on the critical path.
+STATIC_IMPORT_RE = re.compile(rb"""(?:\bimport|\bfrom)\s*["']([^"'\s]+)["']""")
+STYLE_BLOCK_RE = re.compile(r"<style\b[^>]*>(.*?)</style\s*>", re.IGNORECASE | re.DOTALL)
+FONT_FACE_RE = re.compile(r"@font-face\s*\{([^}]*)\}", re.IGNORECASE)
+FACE_SRC_RE = re.compile(r"""url\(\s*["']?([^"')\s]+\.woff2)["']?\s*\)""", re.IGNORECASE)
+FACE_STYLE_RE = re.compile(r"font-style:\s*([\w-]+)", re.IGNORECASE)
+UNICODE_RANGE_RE = re.compile(r"unicode-range:\s*([^;}]+)", re.IGNORECASE)
+# Matches --framer-font-family too; style attributes carry their quotes as &quot;.
+FONT_FAMILY_RE = re.compile(r"""font-family:\s*(?:&quot;|["'])?([^"'&,;}]+)""", re.IGNORECASE)
+FONT_WEIGHT_RE = re.compile(r"font-weight:\s*(\d+)", re.IGNORECASE)
+DECLARATIONS_RE = re.compile(r"\{([^{}]*)\}")
+STYLE_ATTR_RE = re.compile(r'\sstyle="([^"]*)"', re.IGNORECASE)
+
+
+def existing_hints(text: str, page_url: str) -> dict:
+    """{rel: set of absolute hrefs} for the <link> tags already in the page.
+
+    Framer emits its modulepreload links at the end of <body>; the preload scanner finds
+    them there, so they are not repeated in the head.
+    """
+    found = {}
+    for tag in HINT_LINK_RE.findall(text):
+        rel, href = LINK_REL_RE.search(tag), LINK_HREF_RE.search(tag)
+        if rel and href:
+            found.setdefault(rel.group(1).lower(), set()).add(urljoin(page_url, html.unescape(href.group(1))))
+    return found
+
+
+def module_imports(url: str, mappings: dict, cache: dict):
+    """Absolute URLs statically imported by the downloaded module at `url`."""
+    if url not in cache:
+        local = mappings.get(url)
+        data = local.read_bytes() if local is not None and local.exists() else b""
+        cache[url] = [urljoin(url, m.decode("utf-8", errors="ignore")) for m in STATIC_IMPORT_RE.findall(data)]
+    return cache[url]
+
+
+def module_graph(entries, mappings: dict, cache: dict):
+    """Every downloaded module reachable from `entries` through static imports, breadth-first."""
+    seen = set(entries)
+    order = []
+    queue = list(entries)
+    while queue:
+        url = queue.pop(0)
+        for dep in module_imports(url, mappings, cache):
+            if dep not in seen and dep in mappings:
+                seen.add(dep)
+                order.append(dep)
+                queue.append(dep)
+    return order
+
+
+def covers_latin(ranges: str) -> bool:
+    for part in ranges.split(","):
+        lo, _, hi = part.strip()[2:].partition("-")
+        try:
+            if int(lo, 16) <= ord("A") <= int(hi or lo, 16):
+                return True
+        except ValueError:
+            continue
+    return False
+
+
+def critical_fonts(text: str, page_url: str):
+    """woff2 URLs of the Latin, upright faces the page's styles use most, at most MAX_FONT_PRELOADS."""
+    faces = {}
+    usage = Counter()
+    groups = STYLE_ATTR_RE.findall(text)
+    for css in STYLE_BLOCK_RE.findall(text):
+        for body in FONT_FACE_RE.findall(css):
+            family, src = FONT_FAMILY_RE.search(body), FACE_SRC_RE.search(body)
+            style, ranges = FACE_STYLE_RE.search(body), UNICODE_RANGE_RE.search(body)
+            weight = FONT_WEIGHT_RE.search(body)
+            if not family or not src or (style and style.group(1).lower() != "normal"):
+                continue
+            if ranges and not covers_latin(ranges.group(1)):
+                continue
+            key = (family.group(1).strip(), weight.group(1) if weight else "400")
+            faces.setdefault(key, urljoin(page_url, src.group(1)))
+        groups += DECLARATIONS_RE.findall(FONT_FACE_RE.sub("", css))
+    for group in groups:
+        family = FONT_FAMILY_RE.search(group)
+        if family:
+            weight = FONT_WEIGHT_RE.search(group)
+            usage[(family.group(1).strip(), weight.group(1) if weight else "400")] += 1
+    used = sorted((key for key in faces if usage[key]), key=lambda key: (-usage[key], key))
+    return [faces[key] for key in used[:MAX_FONT_PRELOADS]]
+
+
+_worker = {}
+
+
+def _init_worker(mappings: dict):
+    _worker["mappings"] = mappings
+    _worker["imports"] = {}
+
+
+def hint_page(job):
+    """Add the missing modulepreload, font preload and preconnect hints to one page in place.
+
+    Returns (hints added, hints now in the page), each as {rel: count}.
+    """
+    page, page_url = job
+    text = page.read_text(encoding="utf-8", errors="ignore")
+    have = existing_hints(text, page_url)
+    entries = [
+        urljoin(page_url, html.unescape(src.group(1)))
+        for tag in MODULE_SCRIPT_RE.findall(text)
+        for src in [SCRIPT_SRC_RE.search(tag)]
+        if src
+    ]
+    preloaded = have.get("modulepreload", set())
+    modules = [
+        url
+        for url in module_graph(entries + sorted(preloaded), _worker["mappings"], _worker["imports"])
+        if url not in preloaded and url not in entries
+    ]
+    fonts = [url for url in critical_fonts(text, page_url) if url not in have.get("preload", set())]
+
+    # Fonts and module scripts are CORS fetches, so the warmed connection must be one too.
+    page_origin = urlparse(page_url).netloc
+    connected = {urlparse(url).netloc for url in have.get("preconnect", set())}
+    origins = []
+    for url in entries + modules + fonts:
+        origin = urlparse(url)
+        if origin.netloc not in connected and origin.netloc != page_origin:
+            connected.add(origin.netloc)
+            origins.append(f"{origin.scheme}://{origin.netloc}")
+
+    patch = HeadPatch(text)
+    for origin in origins:
+        patch.resource_hint("preconnect", origin, " crossorigin")
+    for url in fonts:
+        patch.resource_hint("preload", html.escape(url), ' as="font" type="font/woff2" crossorigin')
+    for url in modules:
+        patch.resource_hint("modulepreload", html.escape(url), ' fetchpriority="low"')
+    updated = patch.render()
+    write_if_changed(page, updated)
+    present = existing_hints(updated, page_url)
+    return (
+        {"preconnect": len(origins), "preload": len(fonts), "modulepreload": len(modules)},
+        {rel: len(present.get(rel, ())) for rel in ("preconnect", "preload", "modulepreload")},
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Inject modulepreload, font preload and preconnect hints into page heads.")
+    add_jobs_argument(parser)
+    add_profile_argument(parser)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    metrics = Metrics("resource_hints", args.profile)
+    assets = json.loads((ROOT / "content" / "assets.json").read_text(encoding="utf-8")).get("downloaded", [])
+    mappings = {item["url"]: ROOT / item["path"] for item in assets}
+    manifest = BuildManifest(ROOT)
+    # The module graph is read from the downloaded files, so any changed asset re-hints every page.
+    node_inputs = {
+        "version": RESOURCE_HINTS_VERSION,
+        "assets": sha256_json([[item["url"], item.get("sha256")] for item in assets]),
+    }
+    results = {}
+    todo = []
+    for page in site_pages(ROOT):
+        if not page.exists():
+            continue
+        rel = page.relative_to(ROOT).as_posix()
+        node_key = f"hints:{rel}"
+        if manifest.fresh_output(node_key, node_inputs, page):
+            results[rel] = manifest.nodes[node_key]["value"]
+            continue
+        page_url = urljoin(SITE_URL + "/", rel[: -len("index.html")])
+        todo.append((page, page_url, rel, node_key))
+
+    with metrics.stage("resource_hints"):
+        added = map_pages(
+            hint_page,
+            [(page, page_url) for page, page_url, _, _ in todo],
+            args.jobs,
+            initializer=_init_worker,
+            initargs=(mappings,),
+        )
+    new = Counter()
+    for (page, _, rel, node_key), (counts, present) in zip(todo, added):
+        new.update(counts)
+        results[rel] = present
+        manifest.record(node_key, node_inputs, present, output=page)
+    manifest.save(prune_prefixes=("hints:",))
+
+    totals = Counter()
+    for present in results.values():
+        totals.update(present)
+    update_report(ROOT, "resource_hints", {"pages": dict(sorted(results.items())), "totals": dict(sorted(totals.items()))})
+    print(f"Hinted pages: {len(results)} ({len(todo)} checked this run)")
+    print(f"Hints added: {new['modulepreload']} modulepreload, {new['preload']} font preload, {new['preconnect']} preconnect")
+    metrics.publish(ROOT)
+
+
+if __name__ == "__main__":
+    main()
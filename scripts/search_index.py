@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import math
+import re
+import sys
+import time
+from bisect import bisect_left
+from collections import Counter
+from pathlib import Path
+
+from build_graph import BuildManifest, sha256_file, write_if_changed
+from content_store import ContentStore
+from instrumentation import Metrics, add_profile_argument
+
+ROOT = Path(__file__).resolve().parents[1]
+INDEX_PATH = ROOT / "content" / "search_index.json"
+# Bump when tokenization, weights or the shard layout change.
+SEARCH_INDEX_VERSION = 1
+TOKEN_RE = re.compile(r"[^\W_]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the this to was were will with".split()
+)
+FIELD_WEIGHTS = {"title": 3, "headings": 2, "project": 2, "paragraphs": 1}
+SUMMARY_CHARS = 160
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def document_fields(page: dict, project: dict = None) -> dict:
+    fields = {
+        "title": page.get("title") or "",
+        "headings": " ".join(h["text"] for h in page.get("headings", [])),
+        "paragraphs": " ".join(page.get("paragraphs", [])),
+        "project": "",
+    }
+    if project:
+        fields["project"] = " ".join(
+            [project["title"], project["overview"], project["client"], " ".join(project["services"])]
+        )
+    return fields
+
+
+def build_shard(pages, projects) -> dict:
+    """Inverted index over pages: weighted term frequencies, per-doc lengths for BM25.
+
+    `terms` maps each term to a flat [doc, tf, doc, tf, ...] list so the shard stays small
+    and can be read by a client-side script without a schema.
+    """
+    by_url = {p["url"]: p for p in projects}
+    docs = []
+    lengths = []
+    postings = {}
+    for doc_id, page in enumerate(pages):
+        tf = Counter()
+        for field, text in document_fields(page, by_url.get(page["path"])).items():
+            for token in tokenize(text):
+                tf[token] += FIELD_WEIGHTS[field]
+        docs.append({
+            "path": page["path"],
+            "title": page.get("title") or "",
+            "summary": (page.get("description") or "")[:SUMMARY_CHARS],
+        })
+        lengths.append(sum(tf.values()))
+        for term, count in tf.items():
+            postings.setdefault(term, []).extend((doc_id, count))
+    return {
+        "version": SEARCH_INDEX_VERSION,
+        "docs": docs,
+        "lengths": lengths,
+        "avg_length": round(sum(lengths) / len(lengths), 3) if lengths else 0,
+        "terms": dict(sorted(postings.items())),
+    }
+
+
+class SearchIndex:
+    def __init__(self, shard: dict):
+        self.shard = shard
+        self.terms = shard["terms"]
+        self._sorted_terms = None
+
+    @classmethod
+    def load(cls, path: Path = INDEX_PATH):
+        return cls(json.loads(path.read_text(encoding="utf-8")))
+
+    def expand(self, token: str, prefix: bool):
+        if not prefix:
+            return [token] if token in self.terms else []
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.terms)
+        i = bisect_left(self._sorted_terms, token)
+        found = []
+        while i < len(self._sorted_terms) and self._sorted_terms[i].startswith(token):
+            found.append(self._sorted_terms[i])
+            i += 1
+        return found
+
+    def search(self, query: str, limit: int = 10):
+        """BM25-ranked [(score, doc)]; the last query word also matches as a prefix."""
+        tokens = tokenize(query)
+        n_docs = len(self.shard["docs"])
+        avg = self.shard["avg_length"] or 1
+        lengths = self.shard["lengths"]
+        scores = Counter()
+        for pos, token in enumerate(tokens):
+            for term in self.expand(token, prefix=pos == len(tokens) - 1):
+                plist = self.terms[term]
+                df = len(plist) // 2
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for i in range(0, len(plist), 2):
+                    doc, tf = plist[i], plist[i + 1]
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc] / avg)
+                    scores[doc] += idf * tf * (BM25_K1 + 1) / norm
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(round(score, 4), self.shard["docs"][doc]) for doc, score in ranked]
+
+
+def snippet(page: dict, query: str, width: int = 160) -> str:
+    """The heading or paragraph with the most query terms, terms marked with [brackets]."""
+    tokens = set(tokenize(query))
+    if not page or not tokens:
+        return ""
+    candidates = [h["text"] for h in page.get("headings", [])] + page.get("paragraphs", [])
+    best = max(candidates, key=lambda text: len(tokens & set(tokenize(text))), default="")
+    words = []
+    for word in best.split():
+        stripped = TOKEN_RE.findall(word.lower())
+        words.append(f"[{word}]" if any(t in tokens or any(t.startswith(q) for q in tokens) for t in stripped) else word)
+    text = " ".join(words)
+    return text if len(text) <= width else text[:width].rsplit(" ", 1)[0] + " ..."
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the full-text index of the mirrored pages.")
+    parser.add_argument("--query", "-q", help="search instead of building; prints ranked paths and snippets")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="print query results as JSON")
+    add_profile_argument(parser)
+    return parser.parse_args(argv)
+
+
+def run_query(args):
+    started = time.perf_counter()
+    results = SearchIndex.load().search(args.query, args.limit)
+    with ContentStore(ROOT) as store:
+        rows = [
+            {"path": doc["path"], "score": score, "title": doc["title"], "snippet": snippet(store.page(doc["path"]), args.query)}
+            for score, doc in results
+        ]
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if args.json:
+        print(json.dumps({"query": args.query, "ms": round(elapsed_ms, 2), "results": rows}, indent=2))
+        return
+    for row in rows:
+        print(f"{row['score']:8.3f}  {row['path']}  {row['title']}")
+        if row["snippet"]:
+            print(f"          {row['snippet']}")
+    print(f"{len(rows)} results in {elapsed_ms:.1f} ms", file=sys.stderr)
+
+
+def main():
+    args = parse_args()
+    if args.query is not None:
+        run_query(args)
+        return
+
+    metrics = Metrics("search_index", args.profile)
+    pages_path = ROOT / "content" / "pages.json"
+    projects_path = ROOT / "content" / "projects.json"
+    manifest = BuildManifest(ROOT)
+    node_inputs = {
+        "pages": sha256_file(pages_path),
+        "projects": sha256_file(projects_path) if projects_path.exists() else "",
+        "version": SEARCH_INDEX_VERSION,
+    }
+    if manifest.fresh_output("search:index", node_inputs, INDEX_PATH):
+        print("Search index: unchanged")
+        return
+    with metrics.stage("search_index_build"):
+        pages = json.loads(pages_path.read_text(encoding="utf-8"))
+        projects = json.loads(projects_path.read_text(encoding="utf-8")) if projects_path.exists() else []
+        shard = build_shard(pages, projects)
+        write_if_changed(INDEX_PATH, json.dumps(shard, ensure_ascii=True, separators=(",", ":")))
+    manifest.record("search:index", node_inputs, output=INDEX_PATH)
+    manifest.save()
+    print(f"Search index: {len(shard['docs'])} pages, {len(shard['terms'])} terms, {INDEX_PATH.stat().st_size} bytes")
+    metrics.publish(ROOT)
+
+
+if __name__ == "__main__":
+    main()
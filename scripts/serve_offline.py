@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import email.utils
+import json
+import mimetypes
+import re
+import sys
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from build_graph import MANIFEST_PATH, sha256_file
+
+ROOT = Path(__file__).resolve().parents[1]
+OFFLINE = ROOT / "offline"
+# Offline pages link assets as ../assets/..., which resolves to /assets/ at the site root;
+# /content/ exposes the JSON data (e.g. search_index.json) the same way. Files under the
+# served root itself (offline/assets/...) win over the mounts.
+MOUNTS = [("/assets/", ROOT / "assets"), ("/content/", ROOT / "content")]
+CACHEABLE_SUFFIXES = {".html", ".mjs", ".js", ".css", ".json", ".svg", ".txt", ".xml"}
+SIDECARS = [("br", ".br"), ("gzip", ".gz")]
+CACHE_MB = 64
+CACHE_ENTRY_MAX_BYTES = 4 * 1024 * 1024
+MAX_HEADER_BYTES = 64 * 1024
+KEEPALIVE_SECONDS = 15
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+EXTRA_TYPES = {
+    ".mjs": "text/javascript",
+    ".woff2": "font/woff2",
+    ".webp": "image/webp",
+    ".avif": "image/avif",
+    ".json": "application/json",
+}
+STATUS_TEXT = {
+    200: "OK",
+    206: "Partial Content",
+    304: "Not Modified",
+    307: "Temporary Redirect",
+    308: "Permanent Redirect",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    416: "Range Not Satisfiable",
+}
+
+
+def content_type(path: Path) -> str:
+    ctype = EXTRA_TYPES.get(path.suffix) or mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    if ctype.startswith("text/") or ctype in ("application/json", "image/svg+xml"):
+        ctype += "; charset=utf-8"
+    return ctype
+
+
+def load_redirects(root: Path):
+    """vercel.json redirects as (regex, host or None, destination, status)."""
+    path = root / "vercel.json"
+    if not path.exists():
+        return []
+    rules = []
+    for rule in json.loads(path.read_text(encoding="utf-8")).get("redirects", []):
+        host = None
+        for cond in rule.get("has", []):
+            if cond.get("type") == "host":
+                host = cond.get("value", "").lower()
+        status = rule.get("statusCode") or (308 if rule.get("permanent", True) else 307)
+        rules.append((re.compile("^" + rule["source"] + "$"), host, rule["destination"], status))
+    return rules
+
+
+def redirect_for(rules, host: str, path: str):
+    host = host.split(":", 1)[0].lower()
+    for pattern, rule_host, destination, status in rules:
+        if rule_host is not None and rule_host != host:
+            continue
+        m = pattern.match(path)
+        if m:
+            location = re.sub(r"\$(\d+)", lambda g: m.group(int(g.group(1))) or "", destination)
+            return location, status
+    return None
+
+
+class ETagTable:
+    """Strong ETags from the sha256s already recorded by the build, hashing only unknown files.
+
+    Digests are tied to the (size, mtime) seen when they were taken, so a file edited while
+    the server runs is re-hashed on its next request. `compressed` holds the source sha256
+    each sidecar was made from, as compress_static.py recorded it.
+    """
+
+    def __init__(self, root: Path):
+        self.entries = {}
+        self.compressed = {}
+        known = {}
+        assets_path = root / "content" / "assets.json"
+        if assets_path.exists():
+            for item in json.loads(assets_path.read_text(encoding="utf-8")).get("downloaded", []):
+                if item.get("sha256"):
+                    known[root / item["path"]] = item["sha256"]
+        manifest_path = root / MANIFEST_PATH
+        if manifest_path.exists():
+            for key, node in json.loads(manifest_path.read_text(encoding="utf-8")).get("nodes", {}).items():
+                if node.get("path") and node.get("output"):
+                    known[root / node["path"]] = node["output"]
+                if key.startswith("compress:"):
+                    self.compressed[root / key[len("compress:"):]] = node["inputs"]["source"]
+        for path, digest in known.items():
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            self.entries[path] = (st.st_size, st.st_mtime_ns, digest)
+
+    def digest(self, path: Path, st) -> str:
+        entry = self.entries.get(path)
+        if entry is None or entry[:2] != (st.st_size, st.st_mtime_ns):
+            entry = (st.st_size, st.st_mtime_ns, sha256_file(path))
+            self.entries[path] = entry
+        return entry[2]
+
+    def etag(self, path: Path, st) -> str:
+        return f'"{self.digest(path, st)[:32]}"'
+
+    def sidecar_fresh(self, path: Path, st, sidecar_st) -> bool:
+        """True when a sidecar encodes the file's current bytes.
+
+        Pages re-rendered after compress_static.py ran (watch.py, a partial rebuild) have a
+        newer mtime than their sidecars; those are only trusted when the recorded source hash
+        still matches.
+        """
+        if sidecar_st.st_mtime_ns >= st.st_mtime_ns:
+            return True
+        return self.compressed.get(path) == self.digest(path, st)
+
+
+class MemoryCache:
+    """Byte-bounded LRU of small text files, keyed by path and validated by (size, mtime)."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.items = OrderedDict()
+
+    def get(self, path: Path, st):
+        item = self.items.get(path)
+        if item is None or item[0] != (st.st_size, st.st_mtime_ns):
+            return None
+        self.items.move_to_end(path)
+        return item[1]
+
+    def put(self, path: Path, st, data: bytes):
+        old = self.items.pop(path, None)
+        if old is not None:
+            self.size -= len(old[1])
+        self.items[path] = ((st.st_size, st.st_mtime_ns), data)
+        self.size += len(data)
+        while self.size > self.max_bytes and self.items:
+            _, (_, evicted) = self.items.popitem(last=False)
+            self.size -= len(evicted)
+
+
+class StaticServer:
+    def __init__(self, root: Path, cache_bytes: int):
+        self.root = root.resolve()
+        self.mounts = [(prefix, base.resolve()) for prefix, base in MOUNTS]
+        self.redirects = load_redirects(ROOT)
+        self.etags = ETagTable(ROOT)
+        self.cache = MemoryCache(cache_bytes)
+
+    def resolve(self, url_path: str):
+        """The file under the served root, else under the mount for this prefix.
+
+        The root is an overlay: build_offline_html.py writes localized copies of downloaded
+        scripts to offline/assets/..., which take precedence over the originals.
+        """
+        candidates = [(self.root, url_path)]
+        for prefix, mount in self.mounts:
+            if url_path.startswith(prefix):
+                candidates.append((mount, url_path[len(prefix):]))
+                break
+        for base, rel in candidates:
+            target = (base / rel.lstrip("/")).resolve()
+            if target != base and base not in target.parents:
+                continue
+            if target.is_dir():
+                target = target / "index.html"
+            if target.is_file():
+                return target
+        return None
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_SECONDS)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.LimitOverrunError):
+                    return
+                keep_alive = await self.respond(head, writer)
+                if not keep_alive:
+                    return
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, head: bytes, writer) -> bool:
+        lines = head.decode("latin-1").split("\r\n")
+        parts = lines[0].split()
+        if len(parts) != 3:
+            await self.send(writer, 400, {}, b"", False)
+            return False
+        method, target, version = parts
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" and (version == "HTTP/1.1" or connection == "keep-alive")
+
+        if method not in ("GET", "HEAD"):
+            await self.send(writer, 405, {"Allow": "GET, HEAD"}, b"", keep_alive)
+            return keep_alive
+        head_only = method == "HEAD"
+        url = urlsplit(target)
+        url_path = unquote(url.path) or "/"
+
+        redirect = redirect_for(self.redirects, headers.get("host", ""), url_path)
+        if redirect:
+            location = redirect[0] + ("?" + url.query if url.query else "")
+            await self.send(writer, redirect[1], {"Location": location}, b"", keep_alive)
+            return keep_alive
+
+        path = self.resolve(url_path) if "\0" not in url_path else None
+        if path is None:
+            await self.send(writer, 404, {"Content-Type": "text/plain; charset=utf-8"}, b"Not Found\n", keep_alive, head_only)
+            return keep_alive
+
+        st = path.stat()
+        etag = self.etags.etag(path, st)
+        out_headers = {
+            "Content-Type": content_type(path),
+            "Last-Modified": email.utils.formatdate(st.st_mtime, usegmt=True),
+            "Accept-Ranges": "bytes",
+        }
+        compressible = path.suffix in CACHEABLE_SUFFIXES
+        if compressible:
+            out_headers["Vary"] = "Accept-Encoding"
+
+        # Byte ranges are served from the identity representation only.
+        range_header = headers.get("range")
+        if range_header and headers.get("if-range", etag) != etag:
+            range_header = None
+        serve_path, serve_st, encoding = path, st, None
+        if compressible and not range_header:
+            accepted = {e.split(";", 1)[0].strip() for e in headers.get("accept-encoding", "").split(",")}
+            for name, suffix in SIDECARS:
+                sidecar = path.with_name(path.name + suffix)
+                if name in accepted and sidecar.is_file():
+                    sidecar_st = sidecar.stat()
+                    # A stale sidecar would serve the old page; the identity file is current.
+                    if self.etags.sidecar_fresh(path, st, sidecar_st):
+                        serve_path, serve_st, encoding = sidecar, sidecar_st, name
+                        break
+        if encoding:
+            out_headers["Content-Encoding"] = encoding
+            # Each representation needs its own strong validator.
+            etag = etag[:-1] + "-" + encoding + '"'
+        out_headers["ETag"] = etag
+
+        if etag in {t.strip() for t in headers.get("if-none-match", "").split(",")}:
+            await self.send(writer, 304, out_headers, b"", keep_alive)
+            return keep_alive
+
+        size = serve_st.st_size
+        start, end, status = 0, size - 1, 200
+        if range_header:
+            m = RANGE_RE.match(range_header.strip())
+            if m and (m.group(1) or m.group(2)):
+                if m.group(1):
+                    start = int(m.group(1))
+                    end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+                else:
+                    start = max(0, size - int(m.group(2)))
+                if start > end or start >= size:
+                    out_headers["Content-Range"] = f"bytes */{size}"
+                    await self.send(writer, 416, out_headers, b"", keep_alive)
+                    return keep_alive
+                status = 206
+                out_headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        length = end - start + 1
+
+        if compressible and size <= CACHE_ENTRY_MAX_BYTES:
+            data = self.cache.get(serve_path, serve_st)
+            if data is None:
+                data = serve_path.read_bytes()
+                self.cache.put(serve_path, serve_st, data)
+            await self.send(writer, status, out_headers, data[start:end + 1], keep_alive, head_only)
+            return keep_alive
+
+        out_headers["Content-Length"] = str(length)
+        writer.write(self.status_block(status, out_headers, keep_alive))
+        if not head_only and length > 0:
+            with serve_path.open("rb") as fh:
+                # Zero-copy via os.sendfile() on plain sockets; asyncio falls back to reads otherwise.
+                await asyncio.get_running_loop().sendfile(writer.transport, fh, start, length)
+        await writer.drain()
+        return keep_alive
+
+    def status_block(self, status: int, headers: dict, keep_alive: bool) -> bytes:
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def send(self, writer, status: int, headers: dict, body: bytes, keep_alive: bool, head_only: bool = False):
+        if status != 304:
+            headers = dict(headers, **{"Content-Length": str(len(body))})
+        writer.write(self.status_block(status, headers, keep_alive))
+        if body and not head_only:
+            writer.write(body)
+        await writer.drain()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the offline/ build with production redirects.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--root", type=Path, default=OFFLINE, help="directory served at / (default: offline/)")
+    parser.add_argument("--cache-mb", type=int, default=CACHE_MB, help="memory cache for HTML/JS/CSS/JSON")
+    return parser.parse_args(argv)
+
+
+async def serve(args):
+    app = StaticServer(args.root, args.cache_mb * 1024 * 1024)
+    server = await asyncio.start_server(app.handle, args.host, args.port, backlog=1024, limit=MAX_HEADER_BYTES)
+    print(f"Serving {args.root} on http://{args.host}:{args.port}/")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    args = parse_args()
+    if not args.root.is_dir():
+        print(f"WARN {args.root} does not exist; run ./scripts/build_offline_html.py first", file=sys.stderr)
+        sys.exit(1)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
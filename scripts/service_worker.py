@@ -0,0 +1,170 @@
+import json
+import re
+from pathlib import Path
+
+from build_graph import sha256_file, sha256_json, write_if_changed
+
+# Fetched at install so a first visit works offline; images and video are cached on first use.
+PRECACHE_SUFFIXES = {".mjs", ".js", ".css", ".woff2"}
+REVISION_CHARS = 16
+BODY_END_RE = re.compile(r"</body\s*>", re.IGNORECASE)
+# Registration fails on file:// pages; they keep working without the worker.
+REGISTER_SNIPPET = (
+    '<script>if("serviceWorker"in navigator)addEventListener("load",()=>'
+    'navigator.serviceWorker.register("{href}").catch(()=>{{}}))</script>'
+)
+SW_TEMPLATE = """// Generated by scripts/build_offline_html.py from precache-manifest.json; do not edit.
+const VERSION = "__VERSION__";
+const CACHE = "offline";
+const MANIFEST_KEY = "/__precache-manifest";
+const PENDING_KEY = "/__precache-manifest-pending";
+// Content-addressed or revisioned by the manifest: served from cache without a request.
+const CACHE_FIRST = ["/assets/", "/shared/"];
+
+function pageKey(url) {
+  return url.pathname.replace(/index\\.html$/, "").replace(/\\/+$/, "") || "/";
+}
+
+async function storedManifest(cache, key) {
+  const stored = await cache.match(key);
+  return stored ? stored.json() : null;
+}
+
+function revision(manifest, path) {
+  return manifest.precache[path] ?? manifest.runtime[path];
+}
+
+// Only entries whose revision changed since the installed manifest are downloaded again.
+self.addEventListener("install", (event) => {
+  event.waitUntil((async () => {
+    const response = await fetch(`precache-manifest.json?v=${VERSION}`, { cache: "no-cache" });
+    const manifest = await response.json();
+    const cache = await caches.open(CACHE);
+    const old = (await storedManifest(cache, MANIFEST_KEY)) ?? { precache: {}, runtime: {} };
+    const stale = [];
+    for (const [path, rev] of Object.entries(manifest.precache)) {
+      if (old.precache[path] !== rev || !(await cache.match(path))) stale.push(path);
+    }
+    await Promise.all(stale.map(async (path) => {
+      const entry = await fetch(path, { cache: "no-cache" });
+      if (!entry.ok) throw new Error(`precache ${path}: ${entry.status}`);
+      await cache.put(path, entry);
+    }));
+    await cache.put(PENDING_KEY, new Response(JSON.stringify(manifest)));
+    await self.skipWaiting();
+  })());
+});
+
+// Drop runtime entries whose revision changed and anything the build no longer lists.
+self.addEventListener("activate", (event) => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(CACHE);
+    const manifest = await storedManifest(cache, PENDING_KEY);
+    if (manifest) {
+      const old = (await storedManifest(cache, MANIFEST_KEY)) ?? { precache: {}, runtime: {} };
+      for (const request of await cache.keys()) {
+        const path = new URL(request.url).pathname;
+        if (path === MANIFEST_KEY || path === PENDING_KEY) continue;
+        const rev = revision(manifest, path);
+        if (rev === undefined || (!(path in manifest.precache) && revision(old, path) !== rev)) {
+          await cache.delete(request);
+        }
+      }
+      await cache.put(MANIFEST_KEY, new Response(JSON.stringify(manifest)));
+      await cache.delete(PENDING_KEY);
+    }
+    await self.clients.claim();
+  })());
+});
+
+async function cacheFirst(request, key) {
+  const cache = await caches.open(CACHE);
+  const cached = await cache.match(key);
+  if (cached) return cached;
+  const response = await fetch(request);
+  if (response.status === 200) await cache.put(key, response.clone());
+  return response;
+}
+
+async function staleWhileRevalidate(event, key) {
+  const cache = await caches.open(CACHE);
+  const cached = await cache.match(key);
+  const network = fetch(event.request).then(async (response) => {
+    if (response.status === 200 && !response.redirected) await cache.put(key, response.clone());
+    return response;
+  });
+  if (!cached) return network;
+  event.waitUntil(network.catch(() => {}));
+  return cached;
+}
+
+self.addEventListener("fetch", (event) => {
+  const request = event.request;
+  const url = new URL(request.url);
+  // Range requests (video seeking) go straight to the server.
+  if (request.method !== "GET" || url.origin !== self.location.origin || request.headers.has("range")) return;
+  if (request.mode === "navigate") {
+    event.respondWith(staleWhileRevalidate(event, pageKey(url)));
+  } else if (CACHE_FIRST.some((prefix) => url.pathname.startsWith(prefix))) {
+    event.respondWith(cacheFirst(request, url.pathname));
+  }
+});
+"""
+
+
+def page_url(page: Path, offline: Path) -> str:
+    """The site path an offline page is linked as: offline/projects/x/index.html -> /projects/x."""
+    rel = page.relative_to(offline).as_posix()
+    return "/" + rel[: -len("index.html")].rstrip("/") if rel.endswith("index.html") else "/" + rel
+
+
+def add_registration(text: str, href: str) -> str:
+    """Insert the service worker registration before the last </body>."""
+    snippet = REGISTER_SNIPPET.format(href=href)
+    ends = list(BODY_END_RE.finditer(text))
+    if not ends:
+        return text + snippet
+    return text[: ends[-1].start()] + snippet + text[ends[-1].start():]
+
+
+def precache_manifest(root: Path, offline: Path, downloaded, copies: dict, derivatives: dict, shared: dict, pages):
+    """({"version", "precache", "runtime"}, precached bytes) for the offline tree.
+
+    Each entry maps a site path to a revision: the content hash of the file the server
+    sends, so an entry is invalidated exactly when its bytes change.
+    """
+    precache = {}
+    runtime = {}
+    precache_bytes = 0
+    for page in pages:
+        if page.exists():
+            precache[page_url(page, offline)] = sha256_file(page)[:REVISION_CHARS]
+            precache_bytes += page.stat().st_size
+    for name in shared.values():
+        # Named by the inline block's hash, but the file's URLs are rewritten relative to it.
+        path = offline / "shared" / name
+        precache[page_url(path, offline)] = sha256_file(path)[:REVISION_CHARS]
+        precache_bytes += path.stat().st_size
+    for item in downloaded:
+        local = copies.get(item["url"]) or root / item["path"]
+        if not local.exists():
+            continue
+        # A localized copy differs from the downloaded file it is served in place of.
+        digest = sha256_file(local) if item["url"] in copies else item.get("sha256") or sha256_file(local)
+        if local.suffix in PRECACHE_SUFFIXES:
+            precache["/" + item["path"]] = digest[:REVISION_CHARS]
+            precache_bytes += local.stat().st_size
+        else:
+            runtime["/" + item["path"]] = digest[:REVISION_CHARS]
+    for item in derivatives.values():
+        for variant in item["variants"]:
+            # Derivative names already carry the source hash; bytes catch re-encodes.
+            runtime["/" + variant["path"]] = sha256_json([item["sha256"], variant["bytes"]])[:REVISION_CHARS]
+    version = sha256_json([precache, runtime])[:REVISION_CHARS]
+    return {"version": version, "precache": precache, "runtime": runtime}, precache_bytes
+
+
+def write_service_worker(offline: Path, manifest: dict):
+    """Write precache-manifest.json and sw.js; sw.js changes, and so reinstalls, only with the manifest."""
+    write_if_changed(offline / "precache-manifest.json", json.dumps(manifest, indent=1, sort_keys=True))
+    write_if_changed(offline / "sw.js", SW_TEMPLATE.replace("__VERSION__", manifest["version"]))
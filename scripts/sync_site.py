@@ -1,18 +1,34 @@
 #!/usr/bin/env python3
+import argparse
 import hashlib
 import html
+import http.client
 import json
 import os
 import re
+import shutil
+import ssl
 import subprocess
 import sys
+import tempfile
+import threading
 import time
-from collections import deque
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from urllib.error import HTTPError
 from urllib.parse import urljoin, urlparse, unquote
-from urllib.request import Request, urlopen
 
-BASE_URL = "https://meettarek.framer.website"
+from asset_verify import verify_assets
+from build_graph import FILE_MODE, BuildManifest, sha256_text, update_report, write_if_changed
+from content_store import STORE_DIR, write_store
+from image_headers import image_size
+from instrumentation import Metrics, add_profile_argument
+from page_pool import add_jobs_argument, map_pages
+
+# BASE_URL, SEED_PATHS and the asset hosts can be overridden from the environment so the
+# pipeline can run against a local stand-in server (see scripts/benchmark.py).
+BASE_URL = os.environ.get("SYNC_BASE_URL", "https://meettarek.framer.website")
 SEED_PATHS = [
     "/",
     "/projects",
@@ -27,6 +43,8 @@ SEED_PATHS = [
     "/projects/vtt-mycelium-leather",
     "/projects/witness-experince",
 ]
+if os.environ.get("SYNC_SEED_PATHS"):
+    SEED_PATHS = os.environ["SYNC_SEED_PATHS"].split(",")
 ALLOWED_EXTERNAL_HOSTS = {
     "framerusercontent.com",
     "framer.com",
@@ -34,37 +52,445 @@ ALLOWED_EXTERNAL_HOSTS = {
     "www.googletagmanager.com",
     "googletagmanager.com",
 }
+ALLOWED_EXTERNAL_HOSTS |= {h for h in os.environ.get("SYNC_EXTRA_ASSET_HOSTS", "").split(",") if h}
 VALID_PATH_RE = re.compile(r"^/(?:$|[a-z0-9][a-z0-9/_-]*)$")
-FORCE_REFRESH = True
+VALIDATOR_CACHE_PATH = Path(".cache") / "http_validators.json"
+BLOB_STORE_PATH = Path(".cache") / "blobs"
+TEMP_PATH = Path(".cache") / "tmp"
+STREAM_CHUNK_BYTES = 256 * 1024
+# Bump when scan_page()/parse_page() output changes so cached page analyses are rebuilt.
+PAGE_ANALYSIS_VERSION = 2
+USER_AGENT = "Mozilla/5.0 (compatible; SiteMirrorBot/1.0)"
+ASSET_WORKERS = 16
+CRAWL_WORKERS = 8
+PER_HOST_CONNECTIONS = 6
+REQUEST_DELAY_SECONDS = 0.0
+FETCH_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 0.5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_REDIRECTS = 5
+# Scripts run after the sync, in order: (script, label, takes --jobs).
+POST_PROCESSING_STEPS = [
+    ("build_images.py", "Image derivatives", True),
+    ("image_loading.py", "Image loading attributes", True),
+    # Before the SEO pass, which minifies the page it patches.
+    ("resource_hints.py", "Resource hints", True),
+    ("apply_seo_geo.py", "SEO/GEO post-processing", True),
+    ("search_index.py", "Search index", False),
+    ("minify_html.py", "HTML minification", True),
+    ("compress_static.py", "Static compression", True),
+]
 
-HREF_RE = re.compile(r"href=\"([^\"]+)\"", re.IGNORECASE)
-SRC_RE = re.compile(r"src=\"([^\"]+)\"", re.IGNORECASE)
 META_CONTENT_RE = re.compile(
     r'<meta[^>]+name=\"(?:framer-search-index|framer-search-index-fallback)\"[^>]+content=\"([^\"]+)\"',
     re.IGNORECASE,
 )
-CSS_URL_RE = re.compile(r"url\(([^)]+)\)", re.IGNORECASE)
-TITLE_RE = re.compile(r"<title>(.*?)</title>", re.IGNORECASE | re.DOTALL)
 META_RE = re.compile(r'<meta[^>]+name="([^"]+)"[^>]+content="([^"]*)"', re.IGNORECASE)
 CANONICAL_RE = re.compile(r'<link[^>]+rel="canonical"[^>]+href="([^"]+)"', re.IGNORECASE)
-H_RE = re.compile(r"<h([1-4])[^>]*>(.*?)</h\1>", re.IGNORECASE | re.DOTALL)
-P_RE = re.compile(r"<p[^>]*>(.*?)</p>", re.IGNORECASE | re.DOTALL)
-A_RE = re.compile(r'<a[^>]+href="([^"]+)"[^>]*>(.*?)</a>', re.IGNORECASE | re.DOTALL)
-IMG_RE = re.compile(r'<img[^>]+src="([^"]+)"[^>]*>', re.IGNORECASE)
+A_OPEN_RE = re.compile(r'<a[^>]+href="([^"]+)"', re.IGNORECASE)
+IMG_SRC_RE = re.compile(r'src="([^"]+)"', re.IGNORECASE)
 ALT_RE = re.compile(r'alt="([^"]*)"', re.IGNORECASE)
+TAG_STRIP_RE = re.compile(r"<[^>]+>")
+# One tokenizer over the ASCII-lowercased page bytes: the tags parse_page() needs plus
+# href/src/srcset/url() references anywhere in the document. Byte offsets into the lowered copy
+# are offsets into the original, so values are sliced from the original bytes.
+SCAN_RE = re.compile(
+    rb'<(?P<close>/?)(?P<name>title|h[1-4]|img|meta|link|[pa])(?P<attrs>[^>]*)>'
+    rb'|href="(?P<href>[^"]+)"'
+    rb'|src="(?P<src>[^"]+)"'
+    rb'|srcset="(?P<srcset>[^"]+)"'
+    rb'|url\((?P<css>[^)]+)\)'
+)
+ATTR_URL_RE = re.compile(
+    rb'href="(?P<href>[^"]+)"|src="(?P<src>[^"]+)"|srcset="(?P<srcset>[^"]+)"|url\((?P<css>[^)]+)\)'
+)
+# Downloaded files whose contents can reference further assets, and the references followed:
+# static and dynamic module imports, url() in stylesheets, and absolute URLs that name a
+# file (fonts, images, chunks; template literals are cut at "${").
+DEPENDENCY_SUFFIXES = {".mjs", ".js", ".css", ".json"}
+ASSET_URL_SUFFIXES = {
+    ".mjs", ".js", ".json", ".css", ".woff2", ".woff", ".ttf", ".otf",
+    ".png", ".jpg", ".jpeg", ".webp", ".avif", ".gif", ".svg", ".ico", ".mp4", ".webm",
+}
+MODULE_IMPORT_RE = re.compile(rb"""(?:\bimport|\bfrom)\s*\(?\s*["'](\.{1,2}/[^"'\s]+)["']""")
+CSS_URL_RE = re.compile(rb"""url\(\s*["']?([^"')\s]+)""")
+ABSOLUTE_URL_RE = re.compile(rb"""https?://[A-Za-z0-9.-]+(?::\d+)?/[^"'`\s()\\$<>]*""")
+# Bump when extract_asset_dependencies() changes so cached dependency lists are rebuilt.
+ASSET_DEPENDENCY_VERSION = 1
+MAX_DEPENDENCY_ROUNDS = 10
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif"}
 
 
 def clean_text(value: str) -> str:
-    value = re.sub(r"<[^>]+>", " ", value)
-    value = html.unescape(value)
-    value = re.sub(r"\s+", " ", value).strip()
-    return value
+    return " ".join(html.unescape(TAG_STRIP_RE.sub(" ", value)).split())
+
+
+class StreamSink:
+    """Streams a response body into a temp file, hashing it as it goes."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.tmp = None
+        self.size = 0
+        self.digest = ""
+
+    def begin(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(dir=self.directory, prefix=".dl-", suffix=".part")
+        os.chmod(name, FILE_MODE)
+        self._fh = os.fdopen(fd, "wb")
+        self._hash = hashlib.sha256()
+        self.tmp = Path(name)
+        self.size = 0
+
+    def write(self, chunk: bytes):
+        self._fh.write(chunk)
+        self._hash.update(chunk)
+        self.size += len(chunk)
+
+    def finish(self):
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._fh.close()
+        self.digest = self._hash.hexdigest()
+
+    def abort(self):
+        if self.tmp is not None:
+            self._fh.close()
+            self.tmp.unlink(missing_ok=True)
+            self.tmp = None
+
+    def commit(self, out: Path):
+        os.replace(self.tmp, out)
+        self.tmp = None
+
+
+class HostPool:
+    """Persistent HTTP/1.1 connections per host with a per-host concurrency cap.
+
+    `delay` spaces out request starts to the same host by at least that many seconds.
+    """
+
+    def __init__(self, per_host: int = PER_HOST_CONNECTIONS, delay: float = REQUEST_DELAY_SECONDS):
+        self.per_host = per_host
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._slots = {}
+        self._next_start = {}
+        self._ssl = ssl.create_default_context()
+
+    def _slot(self, key):
+        with self._lock:
+            if key not in self._slots:
+                self._slots[key] = threading.BoundedSemaphore(self.per_host)
+                self._idle[key] = []
+            return self._slots[key]
+
+    def _connect(self, key, timeout: int):
+        scheme, netloc = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=timeout, context=self._ssl)
+        return http.client.HTTPConnection(netloc, timeout=timeout)
+
+    def _wait_turn(self, key):
+        if self.delay <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(key, now))
+            self._next_start[key] = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+    def _checkout(self, key, timeout: int):
+        with self._lock:
+            if self._idle[key]:
+                return self._idle[key].pop(), True
+        return self._connect(key, timeout), False
+
+    def _checkin(self, key, conn):
+        with self._lock:
+            self._idle[key].append(conn)
+
+    def request(self, url: str, timeout: int = 30, extra_headers=None, sink: StreamSink = None):
+        """Return (status, reason, headers, body) for a single GET without following redirects.
+
+        With a `sink`, a 2xx body is streamed into it in fixed-size chunks and `body` is None.
+        """
+        parsed = urlparse(url)
+        key = (parsed.scheme, parsed.netloc)
+        target = parsed.path or "/"
+        if parsed.query:
+            target += "?" + parsed.query
+        headers = {"User-Agent": USER_AGENT, "Connection": "keep-alive"}
+        headers.update(extra_headers or {})
+        with self._slot(key):
+            self._wait_turn(key)
+            started = time.perf_counter()
+            conn, reused = self._checkout(key, timeout)
+            try:
+                conn.request("GET", target, headers=headers)
+                resp = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if not reused:
+                    raise
+                # The server dropped an idle keep-alive connection; retry once on a fresh one.
+                conn = self._connect(key, timeout)
+                try:
+                    conn.request("GET", target, headers=headers)
+                    resp = conn.getresponse()
+                except Exception:
+                    conn.close()
+                    raise
+            except Exception:
+                conn.close()
+                raise
+            try:
+                if sink is not None and 200 <= resp.status < 300:
+                    body = None
+                    _stream_body(resp, sink)
+                else:
+                    body = resp.read()
+            except Exception:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._checkin(key, conn)
+            nbytes = sink.size if body is None else len(body)
+            METRICS.record_request(url, time.perf_counter() - started, nbytes, resp.status)
+            return resp.status, resp.reason, resp.headers, body
+
+    def close(self):
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+                conns.clear()
+
+
+def _stream_body(resp, sink: StreamSink):
+    sink.begin()
+    try:
+        while True:
+            chunk = resp.read(STREAM_CHUNK_BYTES)
+            if not chunk:
+                break
+            sink.write(chunk)
+        expected = resp.headers.get("Content-Length")
+        if expected is not None and expected.isdigit() and int(expected) != sink.size:
+            raise http.client.IncompleteRead(b"", int(expected) - sink.size)
+        sink.finish()
+    except BaseException:
+        sink.abort()
+        raise
+
+
+HTTP_POOL = HostPool()
+METRICS = Metrics("sync_site")
+
+
+class ValidatorCache:
+    """Persistent ETag/Last-Modified store keyed by URL, used for conditional revalidation."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if path.exists():
+            try:
+                self.entries = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def conditional_headers(self, url: str, local: Path) -> dict:
+        entry = self.entries.get(url)
+        if not entry or not local.exists():
+            return {}
+        # Only trust validators when the local copy still matches what they describe.
+        if local.stat().st_size != entry.get("bytes") or local.stat().st_size == 0:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def record(self, url: str, headers, size: int, digest: str):
+        # Kept without validators too: the digest tells an unchanged page body apart.
+        entry = {
+            "etag": headers.get("ETag", ""),
+            "last_modified": headers.get("Last-Modified", ""),
+            "bytes": size,
+            "sha256": digest,
+        }
+        with self._lock:
+            self.entries[url] = entry
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            payload = json.dumps(self.entries, indent=2, sort_keys=True, ensure_ascii=True)
+        self.path.write_text(payload, encoding="utf-8")
+
+
+class BlobStore:
+    """Content-addressed asset store; per-URL paths are hardlinks to one blob per sha256."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def blob_path(self, digest: str) -> Path:
+        return self.path / digest[:2] / digest
+
+    def put(self, sink: StreamSink) -> str:
+        """Move a finished download into the store, dropping it if the blob already exists."""
+        blob = self.blob_path(sink.digest)
+        with self._lock:
+            if blob.exists():
+                sink.abort()
+            else:
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                sink.commit(blob)
+        return sink.digest
+
+    def adopt(self, digest: str, local: Path):
+        """Register an existing local file (e.g. after a 304) as the blob for `digest`."""
+        blob = self.blob_path(digest)
+        with self._lock:
+            if blob.exists():
+                return
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(local, blob)
+            except OSError:
+                shutil.copyfile(local, blob)
+
+    def materialize(self, digest: str, out: Path):
+        blob = self.blob_path(digest)
+        if out.exists() and os.path.samefile(out, blob):
+            return
+        tmp = out.with_name(f".{out.name}.{threading.get_ident()}.part")
+        tmp.unlink(missing_ok=True)
+        try:
+            os.link(blob, tmp)
+        except OSError:
+            # Filesystems without hardlinks (or a store on another device) fall back to a copy.
+            shutil.copyfile(blob, tmp)
+        os.replace(tmp, out)
+
+    def prune(self, keep: set) -> int:
+        removed = 0
+        if not self.path.exists():
+            return removed
+        for blob in self.path.glob("*/*"):
+            if blob.is_file() and blob.name not in keep:
+                blob.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+
+def asset_store_stats(downloaded) -> dict:
+    unique = {}
+    logical = 0
+    for item in downloaded:
+        logical += item["bytes"]
+        unique.setdefault(item["sha256"], item["bytes"])
+    stored = sum(unique.values())
+    return {
+        "urls": len(downloaded),
+        "unique_blobs": len(unique),
+        "duplicate_urls": len(downloaded) - len(unique),
+        "logical_bytes": logical,
+        "stored_bytes": stored,
+        "deduplicated_bytes": logical - stored,
+    }
+
+
+def fetch_url(url: str, timeout: int = 30, extra_headers=None, sink: StreamSink = None):
+    """GET `url` through the shared pool; returns (status, headers, body). 304 is returned, not raised."""
+    attempt = 0
+    redirects = 0
+    while True:
+        try:
+            status, reason, headers, body = HTTP_POOL.request(
+                url, timeout=timeout, extra_headers=extra_headers, sink=sink
+            )
+        except (OSError, http.client.HTTPException):
+            if attempt >= FETCH_RETRIES:
+                raise
+            time.sleep(RETRY_BACKOFF_SECONDS * (2 ** attempt))
+            attempt += 1
+            continue
+        if status in (301, 302, 303, 307, 308) and headers.get("Location"):
+            redirects += 1
+            if redirects > MAX_REDIRECTS:
+                raise HTTPError(url, status, "Too many redirects", headers, None)
+            url = urljoin(url, headers["Location"])
+            continue
+        if status in RETRY_STATUSES and attempt < FETCH_RETRIES:
+            retry_after = headers.get("Retry-After", "")
+            delay = RETRY_BACKOFF_SECONDS * (2 ** attempt)
+            if retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            time.sleep(delay)
+            attempt += 1
+            continue
+        if status >= 400:
+            raise HTTPError(url, status, reason, headers, None)
+        return status, headers, body
 
 
 def fetch_bytes(url: str, timeout: int = 30) -> bytes:
-    req = Request(url, headers={"User-Agent": "Mozilla/5.0 (compatible; SiteMirrorBot/1.0)"})
-    with urlopen(req, timeout=timeout) as resp:
-        return resp.read()
+    return fetch_url(url, timeout=timeout)[2]
+
+
+def fetch_cached(
+    url: str,
+    out: Path,
+    cache: ValidatorCache,
+    tmp_dir: Path,
+    force: bool = False,
+    store: BlobStore = None,
+    patched: bool = False,
+):
+    """Fetch `url` into `out`, revalidating against `cache`. Returns (bytes, cached, sha256).
+
+    The body is streamed to a temp file under `tmp_dir` and only renamed into place once
+    it is complete, so readers never observe a partially written file.
+
+    With `patched` (pages, which later passes edit in place), the validators describe the
+    downloaded body kept in `store`, and `out` is left alone while that body is unchanged.
+    """
+    previous = cache.entries.get(url, {}).get("sha256")
+    local = store.blob_path(previous) if patched and previous else out
+    headers = {} if force else cache.conditional_headers(url, local)
+    sink = StreamSink(tmp_dir)
+    status, resp_headers, _ = fetch_url(url, extra_headers=headers, sink=sink)
+    if status == 304 and headers:
+        digest = previous
+        if patched:
+            if not out.exists():
+                store.materialize(digest, out)
+        elif store is not None:
+            store.adopt(digest, out)
+            store.materialize(digest, out)
+        METRICS.record_cache_hit(local.stat().st_size)
+        return local.stat().st_size, True, digest
+    cache.record(url, resp_headers, sink.size, sink.digest)
+    size = sink.size
+    if store is None:
+        sink.commit(out)
+        return size, False, sink.digest
+    digest = store.put(sink)
+    if not (patched and digest == previous and out.exists()):
+        store.materialize(digest, out)
+    return size, False, digest
 
 
 def collect_paths_from_json(value, out: set):
@@ -120,23 +546,120 @@ def map_asset_path(root: Path, url: str) -> Path:
     return root / "assets" / "external" / host / p
 
 
-def extract_asset_urls(html_text: str, current_url: str):
+def _pair_spans(openers, closers: dict, raw: bytes):
+    """Match each opener to the first closer after it, skipping openers inside a previous match."""
+    spans = []
+    cursor = 0
+    for start, end, closer, value in openers:
+        if start < cursor:
+            continue
+        positions = closers.get(closer, [])
+        i = bisect_left(positions, end)
+        if i == len(positions):
+            continue
+        spans.append((value, raw[end:positions[i]].decode("utf-8", errors="ignore")))
+        cursor = positions[i] + len(closer) + 3
+    return spans
+
+
+def scan_page(content) -> dict:
+    """Read a page once and collect everything parse_page() and the crawler need."""
+    raw = content.encode("utf-8") if isinstance(content, str) else content
+    lowered = raw.lower()
+    found = {
+        "title": "",
+        "meta": {},
+        "canonical": "",
+        "search_indexes": [],
+        "href": [],
+        "src": [],
+        "srcset": [],
+        "css": [],
+        "anchor_hrefs": [],
+        "images": [],
+    }
+    headings = []
+    paragraphs = []
+    anchors = []
+    titles = []
+    closers = {}
+    for m in SCAN_RE.finditer(lowered):
+        name = m.group("name")
+        if name is None:
+            kind = m.lastgroup
+            found[kind].append(raw[m.start(kind):m.end(kind)].decode("utf-8", errors="ignore"))
+            continue
+        attrs = m.group("attrs")
+        if m.group("close"):
+            if not attrs:
+                closers.setdefault(name, []).append(m.start())
+            continue
+        for am in ATTR_URL_RE.finditer(lowered, m.start(), m.end()):
+            kind = am.lastgroup
+            found[kind].append(raw[am.start(kind):am.end(kind)].decode("utf-8", errors="ignore"))
+        if name == b"title":
+            if not attrs:
+                titles.append((m.start(), m.end(), b"title", None))
+        elif name[0:1] == b"h":
+            headings.append((m.start(), m.end(), name, int(name[1:])))
+        elif name == b"p":
+            paragraphs.append((m.start(), m.end(), b"p", None))
+        elif name == b"a":
+            am = A_OPEN_RE.match(raw[m.start():m.end()].decode("utf-8", errors="ignore"))
+            if am:
+                found["anchor_hrefs"].append(am.group(1))
+                anchors.append((m.start(), m.end(), b"a", am.group(1)))
+        elif name == b"img":
+            if attrs:
+                tag = raw[m.start():m.end()].decode("utf-8", errors="ignore")
+                sm = IMG_SRC_RE.search(tag)
+                if sm:
+                    am = ALT_RE.search(tag)
+                    found["images"].append((sm.group(1), am.group(1) if am else ""))
+        elif name == b"meta":
+            tag = raw[m.start():m.end()].decode("utf-8", errors="ignore")
+            mm = META_RE.match(tag)
+            if mm:
+                found["meta"][mm.group(1).lower()] = html.unescape(mm.group(2))
+            sm = META_CONTENT_RE.match(tag)
+            if sm:
+                found["search_indexes"].append(sm.group(1))
+        elif name == b"link" and not found["canonical"]:
+            cm = CANONICAL_RE.match(raw[m.start():m.end()].decode("utf-8", errors="ignore"))
+            if cm:
+                found["canonical"] = html.unescape(cm.group(1))
+
+    title_spans = _pair_spans(titles, closers, raw)
+    found["title"] = title_spans[0][1] if title_spans else None
+    found["headings"] = _pair_spans(headings, closers, raw)
+    found["paragraphs"] = _pair_spans(paragraphs, closers, raw)
+    found["anchors"] = _pair_spans(anchors, closers, raw)
+    return found
+
+
+def extract_asset_urls(html_text: str, current_url: str, scan: dict = None):
+    scan = scan or scan_page(html_text)
     urls = set()
-    for raw in HREF_RE.findall(html_text):
+    for raw in set(scan["href"]):
         u = html.unescape(raw.strip().strip("'\""))
         if not u or u.startswith("mailto:") or u.startswith("tel:") or u.startswith("javascript:"):
             continue
         urls.add(urljoin(current_url, u))
-    for raw in SRC_RE.findall(html_text):
+    for raw in set(scan["src"]):
         u = html.unescape(raw.strip().strip("'\""))
         if not u or u.startswith("data:") or u.startswith("mailto:") or u.startswith("tel:") or u.startswith("javascript:"):
             continue
         urls.add(urljoin(current_url, u))
-    for raw in META_CONTENT_RE.findall(html_text):
+    for raw in set(scan["srcset"]):
+        for candidate in html.unescape(raw).split(","):
+            parts = candidate.split()
+            if parts and not parts[0].startswith("data:"):
+                urls.add(urljoin(current_url, parts[0]))
+    for raw in set(scan["search_indexes"]):
         u = html.unescape(raw.strip().strip("'\""))
         if u:
             urls.add(urljoin(current_url, u))
-    for raw in CSS_URL_RE.findall(html_text):
+    for raw in set(scan["css"]):
         u = html.unescape(raw.strip().strip("'\""))
         if not u or u.startswith("data:"):
             continue
@@ -144,9 +667,10 @@ def extract_asset_urls(html_text: str, current_url: str):
     return urls
 
 
-def extract_nav_links(html_text: str, current_url: str):
+def extract_nav_links(html_text: str, current_url: str, scan: dict = None):
+    scan = scan or scan_page(html_text)
     links = set()
-    for raw in re.findall(r"<a[^>]+href=\"([^\"]+)\"", html_text, flags=re.IGNORECASE):
+    for raw in scan["anchor_hrefs"]:
         u = html.unescape(raw.strip().strip("'\""))
         if not u or u.startswith("#") or u.startswith("mailto:") or u.startswith("tel:") or u.startswith("javascript:"):
             continue
@@ -154,47 +678,29 @@ def extract_nav_links(html_text: str, current_url: str):
     return links
 
 
-def parse_page(path: str, content: str):
-    title_match = TITLE_RE.search(content)
-    title = clean_text(title_match.group(1)) if title_match else ""
-    meta = {k.lower(): html.unescape(v) for k, v in META_RE.findall(content)}
-    canonical = ""
-    canonical_match = CANONICAL_RE.search(content)
-    if canonical_match:
-        canonical = html.unescape(canonical_match.group(1))
+def parse_page(path: str, content: str, scan: dict = None):
+    scan = scan or scan_page(content)
+    title = clean_text(scan["title"]) if scan["title"] is not None else ""
 
-    headings = [
-        {
-            "level": int(level),
-            "text": clean_text(text),
-        }
-        for level, text in H_RE.findall(content)
-        if clean_text(text)
-    ]
-    paragraphs = [clean_text(p) for p in P_RE.findall(content)]
+    headings = []
+    for level, text in scan["headings"]:
+        text = clean_text(text)
+        if text:
+            headings.append({"level": level, "text": text})
+    paragraphs = [clean_text(p) for _, p in scan["paragraphs"]]
     paragraphs = [p for p in paragraphs if p]
 
     links = []
-    for href, text in A_RE.findall(content):
-        href = html.unescape(href)
-        t = clean_text(text)
-        links.append({"href": href, "text": t})
-
-    images = []
-    for tag in re.findall(r"<img[^>]+>", content, flags=re.IGNORECASE):
-        sm = re.search(r'src="([^"]+)"', tag, flags=re.IGNORECASE)
-        am = ALT_RE.search(tag)
-        if sm:
-            images.append({
-                "src": html.unescape(sm.group(1)),
-                "alt": html.unescape(am.group(1)) if am else "",
-            })
+    for href, text in scan["anchors"]:
+        links.append({"href": html.unescape(href), "text": clean_text(text)})
+
+    images = [{"src": html.unescape(src), "alt": html.unescape(alt)} for src, alt in scan["images"]]
 
     return {
         "path": path,
         "title": title,
-        "description": meta.get("description", ""),
-        "canonical": canonical,
+        "description": scan["meta"].get("description", ""),
+        "canonical": scan["canonical"],
         "headings": headings,
         "paragraphs": paragraphs,
         "links": links,
@@ -202,6 +708,49 @@ def parse_page(path: str, content: str):
     }
 
 
+def analyze_page(root: Path, out: Path, url: str, content: str) -> dict:
+    """Everything the sync needs from one page, as a JSON-serializable build-graph value."""
+    rel = "/" + str(out.relative_to(root)).replace("index.html", "").rstrip("/")
+    page_url = urljoin(BASE_URL, "/" + str(out.relative_to(root)).replace("index.html", "").strip("/"))
+    scan = scan_page(content)
+    return {
+        "search_indexes": scan["search_indexes"],
+        "nav_links": sorted(extract_nav_links(content, url, scan)),
+        "asset_urls": sorted(extract_asset_urls(content, page_url, scan)),
+        "record": parse_page(rel if rel != "" else "/", content, scan),
+    }
+
+
+def _analyze_page_job(job) -> dict:
+    return analyze_page(*job)
+
+
+def fetch_page(root: Path, url: str, cache: ValidatorCache, store: BlobStore, force: bool = False):
+    """Fetch one crawled page into its local path; returns (path, out, content, sha256) or None.
+
+    `content` is the page as downloaded, before the post-processing passes patch `out`.
+    """
+    path = urlparse(url).path or "/"
+    out = local_page_path(root, path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        _, _, digest = fetch_cached(url, out, cache, root / TEMP_PATH, force, store, patched=True)
+        return path, out, store.blob_path(digest).read_bytes().decode("utf-8", errors="ignore"), digest
+    except Exception as exc:
+        print(f"WARN page fetch failed: {url} ({exc})", file=sys.stderr)
+        return None
+
+
+def fetch_search_index_paths(url: str):
+    """Internal paths referenced by a Framer search index, or an empty set on failure."""
+    paths = set()
+    try:
+        collect_paths_from_json(json.loads(fetch_bytes(url).decode("utf-8", errors="ignore")), paths)
+    except Exception as exc:
+        print(f"WARN search index fetch failed: {url} ({exc})", file=sys.stderr)
+    return paths
+
+
 def build_project_record(page):
     slug = page["path"].strip("/").split("/", 1)[-1]
     paragraphs = page["paragraphs"]
@@ -246,72 +795,269 @@ def build_project_record(page):
         "client": client,
         "team": team,
         "overview": overview,
+        "images": page["images"],
     }
 
 
+def with_image_sizes(images, assets_by_url: dict):
+    """Page image records plus the intrinsic size and byte size of the downloaded file."""
+    sized = []
+    for image in images:
+        asset = assets_by_url.get(image["src"])
+        if asset is not None and "width" in asset:
+            image = dict(image, width=asset["width"], height=asset["height"], bytes=asset["bytes"])
+        sized.append(image)
+    return sized
+
+
+def download_asset(root: Path, url: str, cache: ValidatorCache, store: BlobStore, force: bool = False):
+    out = map_asset_path(root, url)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        size, cached, digest = fetch_cached(url, out, cache, root / TEMP_PATH, force, store)
+        return {
+            "url": url,
+            "path": str(out.relative_to(root)),
+            "bytes": size,
+            "cached": cached,
+            "sha256": digest,
+        }, None
+    except Exception as exc:
+        return None, {"url": url, "error": str(exc)}
+
+
+def download_assets(
+    root: Path,
+    urls,
+    cache: ValidatorCache,
+    store: BlobStore,
+    workers: int = ASSET_WORKERS,
+    force: bool = False,
+):
+    targets = []
+    for u in sorted(urls):
+        pu = urlparse(u)
+        if pu.netloc.lower() not in ALLOWED_EXTERNAL_HOSTS:
+            continue
+        if pu.path in ("", "/"):
+            continue
+        targets.append(u)
+
+    downloaded = []
+    failed = []
+    # Results are collected in submission order so assets.json stays sorted by URL.
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for ok, err in pool.map(lambda u: download_asset(root, u, cache, store, force), targets):
+            if ok:
+                downloaded.append(ok)
+            else:
+                failed.append(err)
+    return downloaded, failed
+
+
+def extract_asset_dependencies(url: str, data: bytes):
+    """Asset URLs referenced from inside a downloaded module, script, stylesheet or JSON file."""
+    found = set()
+    for m in MODULE_IMPORT_RE.finditer(data):
+        found.add(urljoin(url, m.group(1).decode("utf-8", errors="ignore")))
+    if urlparse(url).path.lower().endswith(".css"):
+        for m in CSS_URL_RE.finditer(data):
+            u = m.group(1).decode("utf-8", errors="ignore")
+            if not u.startswith("data:"):
+                found.add(urljoin(url, u))
+    for m in ABSOLUTE_URL_RE.finditer(data):
+        u = m.group(0).decode("utf-8", errors="ignore").rstrip(".,;")
+        if os.path.splitext(urlparse(u).path)[1].lower() in ASSET_URL_SUFFIXES:
+            found.add(u)
+    return found
+
+
+def download_dependencies(
+    root: Path,
+    downloaded,
+    failed,
+    cache: ValidatorCache,
+    store: BlobStore,
+    manifest: BuildManifest,
+    workers: int = ASSET_WORKERS,
+    force: bool = False,
+):
+    """Download what downloaded assets reference, round by round, until nothing new turns up.
+
+    Each round's new URLs are fetched concurrently. Dependency lists are kept in the build
+    manifest by content hash, so unchanged bundles are not rescanned. URLs that already
+    failed (`failed`) are not retried.
+    """
+    known = {a["url"] for a in downloaded} | {a["url"] for a in failed}
+    scan = list(downloaded)
+    found_ok = []
+    found_failed = []
+    for _ in range(MAX_DEPENDENCY_ROUNDS):
+        found = set()
+        for asset in scan:
+            if os.path.splitext(urlparse(asset["url"]).path)[1].lower() not in DEPENDENCY_SUFFIXES:
+                continue
+            node_key = f"deps:{asset['url']}"
+            node_inputs = {"sha256": asset["sha256"], "version": ASSET_DEPENDENCY_VERSION}
+            deps = manifest.lookup(node_key, node_inputs)
+            if deps is None:
+                deps = sorted(extract_asset_dependencies(asset["url"], (root / asset["path"]).read_bytes()))
+                manifest.record(node_key, node_inputs, deps)
+            found.update(deps)
+        new = found - known
+        if not new:
+            break
+        known |= new
+        ok, failed = download_assets(root, new, cache, store, workers, force)
+        found_ok += ok
+        found_failed += failed
+        scan = ok
+    return found_ok, found_failed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Mirror the Framer site and rebuild content/*.json.")
+    parser.add_argument("--workers", type=int, default=ASSET_WORKERS, help="concurrent asset downloads")
+    parser.add_argument("--crawl-workers", type=int, default=CRAWL_WORKERS, help="concurrent page fetches")
+    parser.add_argument(
+        "--per-host",
+        type=int,
+        default=PER_HOST_CONNECTIONS,
+        help="max concurrent keep-alive connections per host",
+    )
+    parser.add_argument(
+        "--delay",
+        type=float,
+        default=REQUEST_DELAY_SECONDS,
+        help="minimum seconds between request starts to the same host",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="ignore cached ETag/Last-Modified validators and re-download everything",
+    )
+    parser.add_argument(
+        "--no-post-processing",
+        action="store_true",
+        help="skip the image, SEO/GEO and compression scripts that normally run after the sync",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="don't sync; rehash the downloaded assets against content/assets.json and report "
+        "mismatches, missing files and orphans (exit 1 on mismatch or missing)",
+    )
+    add_jobs_argument(parser)
+    add_profile_argument(parser)
+    return parser.parse_args(argv)
+
+
+def run_verify(root: Path, workers: int) -> int:
+    result = verify_assets(root, workers)
+    update_report(root, "asset_verification", result)
+    for row in result["mismatches"]:
+        print(f"WARN asset mismatch: {row['path']} ({row['actual_bytes']} bytes, sha256 {row['actual_sha256'][:12]})", file=sys.stderr)
+    for rel in result["missing"]:
+        print(f"WARN asset missing: {rel}", file=sys.stderr)
+    print(
+        f"Assets verified: {result['checked']} ({result['hashed']} hashed, "
+        f"{result['unchanged_skipped']} unchanged since last check) in {result['seconds']:.3f}s"
+    )
+    if result["sha256_recorded"]:
+        print(f"Assets without a recorded sha256 (now recorded): {result['sha256_recorded']}")
+    print(f"Mismatches: {len(result['mismatches'])}, missing: {len(result['missing'])}, orphans: {len(result['orphans'])}")
+    return 1 if result["mismatches"] or result["missing"] else 0
+
+
 def main():
+    args = parse_args()
+    METRICS.profile = args.profile
+    HTTP_POOL.per_host = max(1, args.per_host)
+    HTTP_POOL.delay = max(0.0, args.delay)
     root = Path(__file__).resolve().parents[1]
+    if args.verify:
+        sys.exit(run_verify(root, args.jobs))
+    validators = ValidatorCache(root / VALIDATOR_CACHE_PATH)
+    blobs = BlobStore(root / BLOB_STORE_PATH)
+    # Partial downloads left by an interrupted run are never renamed into place; drop them.
+    shutil.rmtree(root / TEMP_PATH, ignore_errors=True)
+    manifest = BuildManifest(root)
     crawled_pages = {}
-    queue = deque(urljoin(BASE_URL, p) for p in SEED_PATHS)
-    seen = set(queue)
+    page_blobs = set()
+    page_analysis = {}
+    analyses_reused = 0
+    frontier = list(dict.fromkeys(urljoin(BASE_URL, p) for p in SEED_PATHS))
+    seen = set(frontier)
     discovered_search_indexes = set()
 
-    while queue:
-        url = queue.popleft()
-        parsed = urlparse(url)
-        if parsed.netloc != urlparse(BASE_URL).netloc:
-            continue
-        path = parsed.path or "/"
-        out = local_page_path(root, path)
-        out.parent.mkdir(parents=True, exist_ok=True)
+    # Breadth-first, one level at a time. Every page in a level (and then every search index
+    # it references) is fetched concurrently, so crawl time grows with link depth rather than
+    # page count; links are then expanded in the order a single-queue BFS would visit them.
+    base_netloc = urlparse(BASE_URL).netloc
+    crawl_pool = ThreadPoolExecutor(max_workers=max(1, args.crawl_workers))
+    while frontier:
+        level = [url for url in frontier if urlparse(url).netloc == base_netloc]
+        with METRICS.stage("crawl"):
+            fetched = []
+            for url, page in zip(level, crawl_pool.map(lambda u: fetch_page(root, u, validators, blobs, args.force), level)):
+                if page is None:
+                    continue
+                path, out, content, digest = page
+                crawled_pages[path] = content
+                page_blobs.add(digest)
+                node_inputs = {"html": sha256_text(content), "url": url, "version": PAGE_ANALYSIS_VERSION}
+                analysis = manifest.lookup(f"page:{path}", node_inputs)
+                if analysis is not None:
+                    analyses_reused += 1
+                fetched.append((url, path, out, content, node_inputs, analysis))
 
-        try:
-            if FORCE_REFRESH or (not out.exists()) or out.stat().st_size == 0:
-                content = fetch_bytes(url).decode("utf-8", errors="ignore")
-                out.write_text(content, encoding="utf-8")
-            else:
-                content = out.read_text(encoding="utf-8", errors="ignore")
-        except Exception as exc:
-            print(f"WARN page fetch failed: {url} ({exc})", file=sys.stderr)
-            continue
+        with METRICS.stage("parse"):
+            pending = [(root, out, url, content) for url, path, out, content, _, analysis in fetched if analysis is None]
+            computed = iter(map_pages(_analyze_page_job, pending, args.jobs))
+            level_indexes = []
+            for url, path, out, content, node_inputs, analysis in fetched:
+                if analysis is None:
+                    analysis = next(computed)
+                    manifest.record(f"page:{path}", node_inputs, analysis)
+                page_analysis[out] = analysis
 
-        crawled_pages[path] = content
+                # Discover dynamic pages from Framer search index JSON.
+                for idx_url in analysis["search_indexes"]:
+                    idx_full = urljoin(url, html.unescape(idx_url.strip()))
+                    if idx_full not in discovered_search_indexes:
+                        discovered_search_indexes.add(idx_full)
+                        level_indexes.append(idx_full)
 
-        # Discover dynamic pages from Framer search index JSON.
-        for idx_url in META_CONTENT_RE.findall(content):
-            idx_full = urljoin(url, html.unescape(idx_url.strip()))
-            if idx_full in discovered_search_indexes:
-                continue
-            discovered_search_indexes.add(idx_full)
-            try:
-                idx_data = json.loads(fetch_bytes(idx_full).decode("utf-8", errors="ignore"))
-                extra_paths = set()
-                collect_paths_from_json(idx_data, extra_paths)
-                for ep in sorted(extra_paths):
+        with METRICS.stage("search_index"):
+            index_paths = dict(zip(level_indexes, crawl_pool.map(fetch_search_index_paths, level_indexes)))
+
+        frontier = []
+        for url, _, out, _, _, _ in fetched:
+            analysis = page_analysis[out]
+            for idx_url in analysis["search_indexes"]:
+                idx_full = urljoin(url, html.unescape(idx_url.strip()))
+                for ep in sorted(index_paths.pop(idx_full, ())):
                     full = urljoin(BASE_URL, ep)
                     if full not in seen:
                         seen.add(full)
-                        queue.append(full)
-            except Exception as exc:
-                print(f"WARN search index fetch failed: {idx_full} ({exc})", file=sys.stderr)
-
-        for found in extract_nav_links(content, url):
-            p2 = urlparse(found)
-            if p2.netloc == urlparse(BASE_URL).netloc:
-                clean = f"{p2.scheme}://{p2.netloc}{p2.path}"
-                # Keep crawl constrained to same site and reasonable depth
-                if clean not in seen and is_valid_internal_path(p2.path):
-                    seen.add(clean)
-                    queue.append(clean)
+                        frontier.append(full)
+
+            for found in analysis["nav_links"]:
+                p2 = urlparse(found)
+                if p2.netloc == base_netloc:
+                    clean = f"{p2.scheme}://{p2.netloc}{p2.path}"
+                    # Keep crawl constrained to same site and reasonable depth
+                    if clean not in seen and is_valid_internal_path(p2.path):
+                        seen.add(clean)
+                        frontier.append(clean)
+    crawl_pool.shutdown()
 
     page_files = sorted({local_page_path(root, p) for p in crawled_pages.keys() if local_page_path(root, p).exists()})
 
     all_asset_urls = set()
     all_internal_links = set()
     for pf in page_files:
-        txt = pf.read_text(encoding="utf-8", errors="ignore")
-        page_url = urljoin(BASE_URL, "/" + str(pf.relative_to(root)).replace("index.html", "").strip("/"))
-        for u in extract_asset_urls(txt, page_url):
+        for u in page_analysis[pf]["asset_urls"]:
             pu = urlparse(u)
             if pu.netloc == urlparse(BASE_URL).netloc:
                 ipath = pu.path or "/"
@@ -320,79 +1066,83 @@ def main():
             elif pu.netloc:
                 all_asset_urls.add(u)
 
-    downloaded_assets = []
-    failed_assets = []
-
-    for u in sorted(all_asset_urls):
-        pu = urlparse(u)
-        host = pu.netloc.lower()
-        if host not in ALLOWED_EXTERNAL_HOSTS:
-            continue
-        if pu.path in ("", "/"):
-            continue
-        out = map_asset_path(root, u)
-        out.parent.mkdir(parents=True, exist_ok=True)
-        try:
-            if FORCE_REFRESH or (not out.exists()) or out.stat().st_size == 0:
-                data = fetch_bytes(u)
-                out.write_bytes(data)
-                downloaded_assets.append({"url": u, "path": str(out.relative_to(root)), "bytes": len(data), "cached": False})
-            else:
-                downloaded_assets.append({"url": u, "path": str(out.relative_to(root)), "bytes": out.stat().st_size, "cached": True})
-        except Exception as exc:
-            failed_assets.append({"url": u, "error": str(exc)})
+    with METRICS.stage("asset_download"):
+        downloaded_assets, failed_assets = download_assets(
+            root, all_asset_urls, validators, blobs, args.workers, args.force
+        )
+    # Module chunks, fonts and images that only the downloaded bundles refer to.
+    with METRICS.stage("asset_dependencies"):
+        dependency_assets, dependency_failed = download_dependencies(
+            root, downloaded_assets, failed_assets, validators, blobs, manifest, args.workers, args.force
+        )
+        downloaded_assets = sorted(downloaded_assets + dependency_assets, key=lambda a: a["url"])
+        failed_assets = sorted(failed_assets + dependency_failed, key=lambda a: a["url"])
+        if not failed_assets:
+            blobs.prune({a["sha256"] for a in downloaded_assets} | page_blobs)
 
-    pages = []
-    for pf in sorted(page_files):
-        rel = "/" + str(pf.relative_to(root)).replace("index.html", "").rstrip("/")
-        if rel == "":
-            rel = "/"
-        pages.append(parse_page(rel, pf.read_text(encoding="utf-8", errors="ignore")))
+    # Header reads only; cached page records stay as parsed, the sizes are added to copies.
+    with METRICS.stage("image_sizes"):
+        for asset in downloaded_assets:
+            if os.path.splitext(urlparse(asset["url"]).path)[1].lower() in IMAGE_SUFFIXES:
+                size = image_size(root / asset["path"])
+                if size is not None:
+                    asset["width"], asset["height"] = size
+    assets_by_url = {a["url"]: a for a in downloaded_assets}
+    pages = [
+        dict(record, images=with_image_sizes(record["images"], assets_by_url))
+        for record in (page_analysis[pf]["record"] for pf in sorted(page_files))
+    ]
 
     projects = [build_project_record(p) for p in pages if p["path"].startswith("/projects/") and p["path"] != "/projects"]
 
-    content_dir = root / "content"
-    reports_dir = root / "reports"
-    content_dir.mkdir(parents=True, exist_ok=True)
-    reports_dir.mkdir(parents=True, exist_ok=True)
-
-    (content_dir / "pages.json").write_text(json.dumps(pages, indent=2, ensure_ascii=True), encoding="utf-8")
-    (content_dir / "projects.json").write_text(json.dumps(projects, indent=2, ensure_ascii=True), encoding="utf-8")
-    (content_dir / "assets.json").write_text(json.dumps({
-        "downloaded": downloaded_assets,
-        "failed": failed_assets,
-    }, indent=2, ensure_ascii=True), encoding="utf-8")
-
-    internal_status = []
-    for p in sorted(all_internal_links):
-        lp = local_page_path(root, p)
-        internal_status.append({
-            "url_path": p,
-            "exists_local": lp.exists(),
-            "local_path": str(lp.relative_to(root)),
-        })
-
-    report = {
-        "generated_at_epoch": int(time.time()),
-        "base_url": BASE_URL,
-        "page_count": len(pages),
-        "project_count": len(projects),
-        "internal_links_found": len(all_internal_links),
-        "external_assets_downloaded": len(downloaded_assets),
-        "external_assets_failed": len(failed_assets),
-        "internal_link_status": internal_status,
-    }
-    (reports_dir / "integrity_report.json").write_text(json.dumps(report, indent=2, ensure_ascii=True), encoding="utf-8")
+    with METRICS.stage("json_write"):
+        content_dir = root / "content"
+        reports_dir = root / "reports"
+        content_dir.mkdir(parents=True, exist_ok=True)
+        reports_dir.mkdir(parents=True, exist_ok=True)
 
-    cms = {
-        "site": {
-            "name": pages[0]["title"] if pages else "",
-            "description": pages[0]["description"] if pages else "",
+        # pages.json stays as the full export; content/store/ holds the same records normalized
+        # and indexed for single-page reads (see content_store.ContentStore).
+        write_if_changed(content_dir / "pages.json", json.dumps(pages, indent=2, ensure_ascii=True))
+        store_bytes = write_store(root, pages)
+        write_if_changed(content_dir / "projects.json", json.dumps(projects, indent=2, ensure_ascii=True))
+        write_if_changed(content_dir / "assets.json", json.dumps({
+            "downloaded": downloaded_assets,
+            "failed": failed_assets,
+        }, indent=2, ensure_ascii=True))
+
+        internal_status = []
+        for p in sorted(all_internal_links):
+            lp = local_page_path(root, p)
+            internal_status.append({
+                "url_path": p,
+                "exists_local": lp.exists(),
+                "local_path": str(lp.relative_to(root)),
+            })
+
+        report = {
+            "generated_at_epoch": int(time.time()),
             "base_url": BASE_URL,
-        },
-        "projects": projects,
-    }
-    (content_dir / "cms.json").write_text(json.dumps(cms, indent=2, ensure_ascii=True), encoding="utf-8")
+            "page_count": len(pages),
+            "project_count": len(projects),
+            "internal_links_found": len(all_internal_links),
+            "external_assets_downloaded": len(downloaded_assets),
+            "external_assets_failed": len(failed_assets),
+            "external_assets_revalidated": sum(1 for a in downloaded_assets if a["cached"]),
+            "asset_store": asset_store_stats(downloaded_assets),
+            "internal_link_status": internal_status,
+        }
+        write_if_changed(reports_dir / "integrity_report.json", json.dumps(report, indent=2, ensure_ascii=True))
+
+        cms = {
+            "site": {
+                "name": pages[0]["title"] if pages else "",
+                "description": pages[0]["description"] if pages else "",
+                "base_url": BASE_URL,
+            },
+            "projects": projects,
+        }
+        write_if_changed(content_dir / "cms.json", json.dumps(cms, indent=2, ensure_ascii=True))
 
     # Remove stale local project folders that are no longer present remotely.
     valid_project_slugs = {p["slug"] for p in projects}
@@ -415,18 +1165,28 @@ def main():
                 except OSError:
                     pass
 
-    print(f"Pages: {len(pages)}")
+    print(f"Pages: {len(pages)} ({analyses_reused} unchanged, reused from build manifest)")
     print(f"Projects: {len(projects)}")
-    print(f"Assets downloaded: {len(downloaded_assets)}")
+    print(f"Content store: {STORE_DIR.as_posix()}/ ({store_bytes} bytes)")
+    print(f"Assets downloaded: {len(downloaded_assets)} ({len(dependency_assets)} found inside other assets)")
     print(f"Assets failed: {len(failed_assets)}")
+    print(f"Assets unchanged (304): {sum(1 for a in downloaded_assets if a['cached'])}")
 
-    seo_script = root / "scripts" / "apply_seo_geo.py"
-    if seo_script.exists():
+    HTTP_POOL.close()
+    validators.save()
+    manifest.save(prune_prefixes=("page:", "deps:"))
+    METRICS.publish(root)
+
+    for script_name, label, pooled in [] if args.no_post_processing else POST_PROCESSING_STEPS:
+        script = root / "scripts" / script_name
+        if not script.exists():
+            continue
         try:
-            subprocess.run([str(seo_script)], check=True)
-            print("SEO/GEO post-processing: done")
+            step_args = (["--jobs", str(args.jobs)] if pooled else []) + (["--profile"] if args.profile else [])
+            subprocess.run([sys.executable, str(script), *step_args], check=True)
+            print(f"{label}: done")
         except Exception as exc:
-            print(f"WARN SEO/GEO post-processing failed: {exc}", file=sys.stderr)
+            print(f"WARN {label} failed: {exc}", file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import apply_seo_geo
+from build_graph import site_pages
+import build_offline_html as offline
+from compress_static import SIDECAR_EXTS
+from service_worker import precache_manifest, write_service_worker
+
+ROOT = Path(__file__).resolve().parents[1]
+POLL_SECONDS = 0.2
+ASSETS_PATH = ROOT / "content" / "assets.json"
+# Changes here invalidate the URL mapping, and with it every offline page.
+MAPPING_INPUTS = [ASSETS_PATH, offline.IMAGES_MANIFEST]
+
+
+def snapshot(paths) -> dict:
+    """(mtime_ns, size) per existing path: a changed file changes at least one of them."""
+    found = {}
+    for path in paths:
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        found[path] = (st.st_mtime_ns, st.st_size)
+    return found
+
+
+def watched_files():
+    return site_pages(ROOT) + MAPPING_INPUTS
+
+
+def drop_sidecars(paths):
+    """Remove the .gz/.br sidecars of rewritten files; compress_static.py makes them again."""
+    for path in paths:
+        for ext in SIDECAR_EXTS:
+            path.with_name(f"{path.name}.{ext}").unlink(missing_ok=True)
+
+
+class WarmBuild:
+    """The SEO and offline passes with their inputs kept in memory between edits.
+
+    Page sources, the URL mapping, image derivatives and the compiled rewrite pattern are
+    loaded once. An edit re-renders only the edited page, unless it changes which inline
+    blocks are shared across pages or the asset mapping, which every page depends on.
+    """
+
+    def __init__(self):
+        self.sources = {}
+        self.shared = None
+        self.load_mapping()
+        for page in site_pages(ROOT):
+            if page.exists():
+                self.sources[page] = page.read_text(encoding="utf-8", errors="ignore")
+        self.plan_shared()
+
+    def load_mapping(self):
+        assets = json.loads(ASSETS_PATH.read_text(encoding="utf-8"))
+        self.downloaded = assets.get("downloaded", [])
+        self.mappings = {}
+        for item in self.downloaded:
+            # The last batch build's localized script copies, as build_offline_html.py maps them.
+            copy = offline.OFFLINE / item["path"]
+            self.mappings[item["url"]] = copy if copy.exists() else ROOT / item["path"]
+        self.derivatives = offline.load_image_derivatives()
+        self.rewriter = offline.UrlRewriter(self.mappings)
+        self.shared = None
+
+    def plan_shared(self) -> bool:
+        """Re-plan the shared blocks; True when the plan changed and every page needs a rewrite."""
+        plan = offline.plan_shared_blocks(list(self.sources.values()), self.rewriter)
+        shared = {digest: name for digest, (name, _, _) in plan.items()}
+        if shared == self.shared:
+            return False
+        self.shared = offline.write_shared_blocks(plan)
+        offline._init_worker(self.mappings, self.derivatives, self.shared, False)
+        return True
+
+    def render(self, pages):
+        """SEO-patch and offline-rewrite `pages`; returns the offline pages written.
+
+        Sidecars of every file written (and of the edited pages) are removed, and the
+        precache manifest is rewritten with the new page revisions.
+        """
+        for page in pages:
+            job = apply_seo_geo.page_job(page)
+            if job is not None:
+                apply_seo_geo.patch_page(job)
+            self.sources[page] = page.read_text(encoding="utf-8", errors="ignore")
+        written = list(pages)
+        if self.plan_shared():
+            pages = list(self.sources)
+            written += sorted(offline.SHARED_DIR.glob("*"))
+        outputs = []
+        for page in pages:
+            dst = offline.OFFLINE / page.relative_to(ROOT)
+            offline._rewrite_page_job((page, dst))
+            outputs.append(dst)
+        drop_sidecars(written + outputs + self.refresh_precache())
+        return outputs
+
+    def refresh_precache(self):
+        """Rewrite precache-manifest.json and sw.js for the current offline tree; returns both paths."""
+        copies = {url: path for url, path in self.mappings.items() if offline.OFFLINE in path.parents}
+        pages = [offline.OFFLINE / page.relative_to(ROOT) for page in self.sources]
+        manifest, _ = precache_manifest(ROOT, offline.OFFLINE, self.downloaded, copies, self.derivatives, self.shared, pages)
+        write_service_worker(offline.OFFLINE, manifest)
+        return [offline.OFFLINE / "precache-manifest.json", offline.OFFLINE / "sw.js"]
+
+    def remove(self, page: Path):
+        self.sources.pop(page, None)
+        dst = offline.OFFLINE / page.relative_to(ROOT)
+        dst.unlink(missing_ok=True)
+        drop_sidecars([page, dst])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Watch mirrored pages and the asset manifests; re-render the affected SEO and offline outputs."
+    )
+    parser.add_argument("--interval", type=float, default=POLL_SECONDS, help="seconds between stat polls")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    started = time.perf_counter()
+    build = WarmBuild()
+    state = snapshot(watched_files())
+    print(f"Loaded {len(build.sources)} pages and {len(build.mappings)} asset URLs in {time.perf_counter() - started:.2f}s")
+    print(f"Watching {len(state)} files (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(args.interval)
+            current = snapshot(watched_files())
+            if current == state:
+                continue
+            changed = {path for path, stamp in current.items() if state.get(path) != stamp}
+            removed = set(state) - set(current)
+            started = time.perf_counter()
+            try:
+                if (changed | removed) & set(MAPPING_INPUTS):
+                    build.load_mapping()
+            except (OSError, ValueError) as exc:
+                # Most likely caught mid-write; the next poll sees the finished file.
+                print(f"WARN could not reload the asset mapping: {exc}", file=sys.stderr)
+                continue
+            for page in removed - set(MAPPING_INPUTS):
+                build.remove(page)
+            if removed - set(MAPPING_INPUTS):
+                drop_sidecars(build.refresh_precache())
+            pages = sorted(changed - set(MAPPING_INPUTS))
+            if build.shared is None:
+                build.plan_shared()
+                pages = list(build.sources)
+            outputs = build.render(pages) if pages else []
+            # Absorb this pass's own writes (the SEO pass patches index.html in place).
+            state = snapshot(watched_files())
+            if outputs or removed:
+                names = ", ".join(str(p.relative_to(ROOT)) for p in outputs[:3]) + (" ..." if len(outputs) > 3 else "")
+                print(f"Rebuilt {len(outputs)} offline pages in {(time.perf_counter() - started) * 1000:.0f} ms: {names}")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
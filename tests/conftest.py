@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The scripts import their siblings by bare name, as they do when run directly.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
@@ -0,0 +1,14 @@
+from build_images import WIDTH_BUCKETS, bucket_widths
+
+
+def test_wide_source_gets_each_bucket_once():
+    assert bucket_widths(3000) == list(WIDTH_BUCKETS)
+
+
+def test_source_at_largest_bucket_gets_it_once():
+    assert bucket_widths(WIDTH_BUCKETS[-1]) == list(WIDTH_BUCKETS)
+
+
+def test_narrow_source_keeps_its_own_width():
+    assert bucket_widths(800) == [320, 640, 800]
+    assert bucket_widths(200) == [200]
@@ -0,0 +1,37 @@
+import re
+
+import pytest
+
+from build_offline_html import INLINE_BLOCK_RE, MIN_SHARED_BLOCK_BYTES, hoistable
+from minify_html import ROOT, html_pages
+
+BODY = "a{color:red}" * (MIN_SHARED_BLOCK_BYTES // 12 + 1)
+
+
+@pytest.mark.parametrize(
+    "attrs",
+    [
+        ' data-framer-css-ssr-minified data-framer-components="framer-a framer-b"',
+        " data-framer-css-ssr",
+        " data-framer-breakpoint-css",
+    ],
+)
+def test_framer_runtime_styles_stay_inline(attrs):
+    assert not hoistable("style", attrs, BODY)
+
+
+def test_plain_shared_style_is_hoisted():
+    assert hoistable("style", ' id="force-light-theme"', BODY)
+    assert not hoistable("style", "", "a{}")
+
+
+@pytest.mark.parametrize("rel", html_pages())
+def test_mirrored_framer_ssr_blocks_stay_inline(rel):
+    text = (ROOT / rel).read_text(encoding="utf-8", errors="ignore")
+    blocks = [
+        (kind, attrs, body)
+        for kind, attrs, body in INLINE_BLOCK_RE.findall(text)
+        if re.search(r"data-framer-(?:css-ssr|breakpoint-css)", attrs)
+    ]
+    assert blocks
+    assert not any(hoistable(*block) for block in blocks)
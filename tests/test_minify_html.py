@@ -0,0 +1,52 @@
+import pytest
+
+from minify_html import ROOT, DomSignature, html_pages, minify_css, minify_html, minify_page
+
+
+@pytest.mark.parametrize("rel", html_pages())
+def test_page_minifies_to_equivalent_dom(rel):
+    before, after, problem = minify_page((rel, False))
+    assert problem is None
+    assert after <= before
+
+
+@pytest.mark.parametrize("rel", html_pages())
+def test_second_pass_changes_nothing(rel):
+    minified = minify_html((ROOT / rel).read_text(encoding="utf-8", errors="ignore"))
+    assert minify_html(minified) == minified
+    assert DomSignature.of(minify_html(minified)) == DomSignature.of(minified)
+
+
+def test_css_strings_are_kept_verbatim():
+    assert minify_css('a { content: "  x ; } " ; }') == 'a{content:"  x ; } "}'
+    assert minify_css("a { content: '/* not a comment */' }") == "a{content:'/* not a comment */'}"
+
+
+def test_css_url_is_kept_verbatim():
+    assert minify_css("a { background: url( a b.png ) }") == "a{background:url( a b.png )}"
+    assert minify_css("a { background: url(x.png?a=1;b=2) }") == "a{background:url(x.png?a=1;b=2)}"
+
+
+def test_css_descendant_pseudo_class_keeps_its_space():
+    assert minify_css("a :hover { color: red ; }") == "a :hover{color:red}"
+    assert minify_css("a:hover , b { color: red }") == "a:hover,b{color:red}"
+
+
+def test_css_comments_are_dropped():
+    assert minify_css("a { /* x */ color: red; } /* y */") == "a{color:red}"
+
+
+def test_head_end_marker_is_preserved():
+    page = "<html><head>\n<!-- Start of headEnd -->\n<!-- dropped -->\n</head><body></body></html>"
+    minified = minify_html(page)
+    assert "<!-- Start of headEnd -->" in minified
+    assert "dropped" not in minified
+
+
+@pytest.mark.parametrize("marker", ["<!--$-->", "<!--/$-->", "<!--$?-->", "<!--$!-->", "<!-- -->"])
+def test_react_hydration_comments_are_preserved(marker):
+    page = f"<html><head></head><body><div>a{marker}b</div><!-- note --></body></html>"
+    minified = minify_html(page)
+    assert marker in minified
+    assert "note" not in minified
+    assert DomSignature.of(page) == DomSignature.of(minified)